@@ -35,6 +35,10 @@ from .auto_color_match import (
     NODE_CLASS_MAPPINGS as AUTO_COLOR_MATCH_CLASS_MAP,
     NODE_DISPLAY_NAME_MAPPINGS as AUTO_COLOR_MATCH_DISPLAY_MAP,
 )
+from .color_lut import (
+    NODE_CLASS_MAPPINGS as COLOR_LUT_CLASS_MAP,
+    NODE_DISPLAY_NAME_MAPPINGS as COLOR_LUT_DISPLAY_MAP,
+)
 
 from .flux_resolution_prepare import (
     NODE_CLASS_MAPPINGS as FLUX_PREP_CLASS_MAP,
@@ -82,6 +86,7 @@ NODE_CLASS_MAPPINGS.update(INTELLIGENT_AUTO_CROP_CLASS_MAP)
 
 NODE_CLASS_MAPPINGS.update(FILENAME_APPEND_SUFFIX_CLASS_MAP)
 NODE_CLASS_MAPPINGS.update(AUTO_COLOR_MATCH_CLASS_MAP)
+NODE_CLASS_MAPPINGS.update(COLOR_LUT_CLASS_MAP)
 
 NODE_CLASS_MAPPINGS.update(FLUX_PREP_CLASS_MAP)
 NODE_CLASS_MAPPINGS.update(WORKFLOW_CONFIG_CLASS_MAP)
@@ -102,6 +107,7 @@ NODE_DISPLAY_NAME_MAPPINGS.update(INTELLIGENT_AUTO_CROP_DISPLAY_MAP)
 
 NODE_DISPLAY_NAME_MAPPINGS.update(FILENAME_APPEND_SUFFIX_DISPLAY_MAP)
 NODE_DISPLAY_NAME_MAPPINGS.update(AUTO_COLOR_MATCH_DISPLAY_MAP)
+NODE_DISPLAY_NAME_MAPPINGS.update(COLOR_LUT_DISPLAY_MAP)
 
 NODE_DISPLAY_NAME_MAPPINGS.update(FLUX_PREP_DISPLAY_MAP)
 NODE_DISPLAY_NAME_MAPPINGS.update(WORKFLOW_CONFIG_DISPLAY_MAP)
@@ -1,140 +1,303 @@
 # auto_adjust.py (extracted from ImageUtils.py)
 # Minimal standalone module containing AutoAdjustNode and AutoColorConfigNode
+import math
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
 import torch
-from .image_utils import enforce_image_format
+from .image_utils import (
+    STATS_RESOLUTIONS,
+    batched_histogram,
+    describe_proxy_error,
+    enforce_image_format,
+    exact_quantiles,
+    stats_proxy,
+)
+
+_HIST_BINS = 256
+# Levels per axis of the joint RGB histogram behind the fast path's derived
+# statistics (32**3 bins per image), and pixels per image per stats chunk.
+_JOINT_LEVELS = 32
+_STATS_CHUNK_ELEMS = 1 << 22
+
+# Rec.601 YCbCr used by the Monochromatic tone and colour stages, as row-vector
+# matrices (pixel @ M). Their product is not exactly the identity, so the
+# stages keep it to stay faithful to a YCbCr round trip.
+_RGB_TO_YCBCR = torch.tensor([
+    [0.299, 0.5643 * -0.299, 0.7132 * (1.0 - 0.299)],
+    [0.587, 0.5643 * -0.587, 0.7132 * -0.587],
+    [0.114, 0.5643 * (1.0 - 0.114), 0.7132 * -0.114],
+], dtype=torch.float32)
+_YCBCR_TO_RGB = torch.tensor([
+    [1.0, 1.0, 1.0],
+    [0.0, -0.3441, 1.7720],
+    [1.4020, -0.7141, 0.0],
+], dtype=torch.float32)
+_YCBCR_ROUND_TRIP = _RGB_TO_YCBCR @ _YCBCR_TO_RGB
+
+
+@dataclass(frozen=True)
+class _AdjustSettings:
+    precision: str = "Exact"
+    auto_levels: bool = True
+    levels_shadow_clip_pct: float = 0.1
+    levels_highlight_clip_pct: float = 0.1
+    levels_gamma_normalize: bool = False
+    auto_tone: bool = True
+    tone_mode: str = "Per-channel"
+    tone_shadow_clip_pct: float = 0.1
+    tone_highlight_clip_pct: float = 0.1
+    auto_color: bool = True
+    snap_neutral_midtones: bool = False
+
+
+@dataclass
+class _AdjustPlan:
+    """Per-image parameters of one AutoAdjust pass; every tensor is batched on dim 0.
+
+    levels: scalar stretch [B, 1, 1, 1] plus an optional gamma curve;
+    tone: per-channel [B, 1, 1, 3] or luma-only [B, 1, 1, 1] stretch;
+    color: 3x3 matrix [B, 3, 3] acting on row vectors, with offset [B, 1, 3].
+    Stages left as None are skipped.
+    """
 
-def _auto_color(rgb, use_color, snap_midtones):
-    if not use_color:
-        return rgb
+    levels_low: Optional[torch.Tensor] = None
+    levels_high: Optional[torch.Tensor] = None
+    gamma_floor: Optional[torch.Tensor] = None
+    gamma: Optional[torch.Tensor] = None
+    tone_low: Optional[torch.Tensor] = None
+    tone_high: Optional[torch.Tensor] = None
+    tone_mono: bool = False
+    color_matrix: Optional[torch.Tensor] = None
+    color_offset: Optional[torch.Tensor] = None
 
-    ycbcr = _rgb_to_ycbcr(rgb)
-    Y, Cb, Cr = ycbcr[..., 0:1], ycbcr[..., 1:2], ycbcr[..., 2:3]
 
-    if snap_midtones:
-        mask = (Y > 0.2) & (Y < 0.8)
-        cb_mid = _median_masked(Cb, mask)
-        cr_mid = _median_masked(Cr, mask)
-        Cb = Cb - cb_mid
-        Cr = Cr - cr_mid
-    else:
-        cb_mean = torch.mean(Cb, dim=(1, 2), keepdim=True)
-        cr_mean = torch.mean(Cr, dim=(1, 2), keepdim=True)
-        Cb = Cb - cb_mean
-        Cr = Cr - cr_mean
+@dataclass
+class _ImageStats:
+    """Everything _analyze_fast needs, gathered in one read of the image.
 
-    ycbcr = torch.cat([Y, Cb, Cr], dim=-1)
-    out = _ycbcr_to_rgb(ycbcr)
-    return out.clamp(0.0, 1.0)
+    hist/low/high cover the planes (Rec.709 luma, R, G, B): [B, 4, bins] counts
+    and [B, 1, 1, 4] extremes. joint_count/joint_mean are a coarse joint RGB
+    histogram, [B, K] counts and [B, K, 3] mean colour per occupied bin.
+    """
 
+    hist: torch.Tensor
+    low: torch.Tensor
+    high: torch.Tensor
+    joint_count: torch.Tensor
+    joint_mean: torch.Tensor
 
-def _median_masked(ch, msk):
-    """Per-image median of ch where msk is True; falls back to all pixels if mask is empty.
 
-    ch, msk: [B, H, W, 1] — result: [B, 1, 1, 1].
-    Replaces the original one-liner which was broken for B > 1 because
-    boolean indexing collapses the batch dimension into a flat 1-D tensor.
+def _analyze_(x, cfg):
+    """Derive the plan stage by stage from x ([B, H, W, 3] float32) — returns (plan, adjusted).
+
+    This is the Exact path.
+    Each stage reads its statistics from the previous stage's output, so x is
+    advanced through the same in-place appliers _apply_plan_ uses; the second
+    return value is therefore the adjusted image, with no extra pass.
     """
-    B = ch.shape[0]
-    result = torch.zeros(B, 1, 1, 1, device=ch.device, dtype=ch.dtype)
-    for b in range(B):
-        ch_b = ch[b]      # [H, W, 1]
-        msk_b = msk[b]    # [H, W, 1]
-        selected = ch_b[msk_b] if msk_b.any() else ch_b.reshape(-1)
-        result[b] = torch.quantile(selected.float(), 0.5)
-    return result
-
-
-def _auto_levels(rgb, use_levels, shadow_pct, highlight_pct, gamma_norm, precision_mode):
-    if not use_levels:
-        return rgb
-
-    Y = _luma(rgb)
-    if shadow_pct == 0.0 and highlight_pct == 0.0:
-        low, high = torch.min(Y, dim=(1, 2), keepdim=True).values, torch.max(Y, dim=(1, 2), keepdim=True).values
-    else:
-        if shadow_pct + highlight_pct > 0:
-            if shadow_pct > 0:
-                low = (_percentiles_exact(Y, shadow_pct / 100.0) if precision_mode == "Exact" else _percentiles_hist(Y, shadow_pct / 100.0))
-            else:
-                low = torch.min(Y, dim=(1, 2), keepdim=True).values
-            if highlight_pct > 0:
-                high = (_percentiles_exact(Y, 1.0 - (highlight_pct / 100.0)) if precision_mode == "Exact" else _percentiles_hist(Y, 1.0 - (highlight_pct / 100.0)))
-            else:
-                high = torch.max(Y, dim=(1, 2), keepdim=True).values
+    plan = _AdjustPlan()
+    if cfg.auto_levels:
+        plan.levels_low, plan.levels_high = _clip_bounds(
+            _luma(x), cfg.levels_shadow_clip_pct, cfg.levels_highlight_clip_pct, cfg.precision
+        )
+        _apply_levels_(x, plan)
+        if cfg.levels_gamma_normalize:
+            plan.gamma_floor, plan.gamma = _gamma_params(_luma(x))
+            _apply_gamma_(x, plan)
+
+    if cfg.auto_tone:
+        plan.tone_mono = cfg.tone_mode != "Per-channel"
+        src = _ycbcr_luma(x) if plan.tone_mono else x
+        plan.tone_low, plan.tone_high = _clip_bounds(
+            src, cfg.tone_shadow_clip_pct, cfg.tone_highlight_clip_pct, cfg.precision
+        )
+        del src
+        x = _apply_tone_(x, plan)
+
+    if cfg.auto_color:
+        plan.color_matrix, plan.color_offset = _color_params(x, cfg.snap_neutral_midtones)
+        x = _apply_color_(x, plan)
+    return plan, x
+
+
+def _analyze_fast(x, cfg):
+    """Derive the plan from one read of x ([B, H, W, 3] float32); x is not modified.
+
+    Levels and per-channel tone percentiles come from the input's luma and
+    channel histograms; levels and gamma are monotone per channel, so the tone
+    percentiles are simply pushed through them. Statistics that mix channels
+    (gamma median, Monochromatic luma, chroma centre) are computed on the
+    bin-mean colours of a coarse joint RGB histogram, advanced through the
+    earlier stages exactly like the image would be.
+    """
+    stats = _gather_stats(x)
+    plan = _AdjustPlan()
+    colors = stats.joint_mean.unsqueeze(2)                   # [B, K, 1, 3] pseudo-image
+    weights = stats.joint_count.unsqueeze(-1)                # [B, K, 1]
+
+    if cfg.auto_levels:
+        plan.levels_low, plan.levels_high = _hist_bounds(
+            stats.hist[:, 0:1], stats.low[..., 0:1], stats.high[..., 0:1],
+            cfg.levels_shadow_clip_pct, cfg.levels_highlight_clip_pct,
+        )
+        _apply_levels_(colors, plan)
+        if cfg.levels_gamma_normalize:
+            Ys = _luma(colors)
+            median = _weighted_quantile(Ys, weights, 0.5, valid=(Ys > 0.25) & (Ys < 0.75))
+            plan.gamma_floor, plan.gamma = _gamma_from_median(median)
+            _apply_gamma_(colors, plan)
+
+    if cfg.auto_tone:
+        plan.tone_mono = cfg.tone_mode != "Per-channel"
+        if plan.tone_mono:
+            plan.tone_low, plan.tone_high = _weighted_bounds(
+                _ycbcr_luma(colors), weights, cfg.tone_shadow_clip_pct, cfg.tone_highlight_clip_pct
+            )
         else:
-            low = _percentiles_exact(Y, shadow_pct / 100.0)
-            high = _percentiles_exact(Y, 1.0 - (highlight_pct / 100.0))
-
-    stretched = _linear_stretch_scalar(rgb, low, high)
-
-    if gamma_norm:
-        # Apply gamma per image so each image gets its own correction factor,
-        # rather than computing one aggregate median across the whole batch.
-        for b in range(stretched.shape[0]):
-            Ys_b = _luma(stretched[b:b + 1])
-            mid_mask = (Ys_b > 0.25) & (Ys_b < 0.75)
-            if mid_mask.any():
-                flat = Ys_b[mid_mask]
-                median = torch.quantile(flat.float(), 0.5).item()
-                if 0.35 < median < 0.65:
-                    gamma = 0.0
-                    if median != 0.0 and median != 1.0:
-                        gamma = torch.log(torch.tensor(0.5)) / torch.log(torch.tensor(median))
-                        gamma = float(torch.clamp(gamma, 0.85, 1.15))
-                    if gamma != 0.0:
-                        stretched[b:b + 1] = torch.clamp(stretched[b:b + 1], 1e-6, 1.0) ** gamma
-
-    return stretched.clamp(0.0, 1.0)
-
-
-def _auto_tone(rgb, use_tone, mode, shadow_pct, highlight_pct, precision_mode):
-    if not use_tone:
-        return rgb
-
-    if mode == "Per-channel":
-        if shadow_pct == 0.0 and highlight_pct == 0.0:
-            low = torch.min(rgb, dim=(1, 2), keepdim=True).values
-            high = torch.max(rgb, dim=(1, 2), keepdim=True).values
+            low, high = _hist_bounds(
+                stats.hist[:, 1:4], stats.low[..., 1:4], stats.high[..., 1:4],
+                cfg.tone_shadow_clip_pct, cfg.tone_highlight_clip_pct,
+            )
+            bounds = torch.cat([low, high], dim=1)           # [B, 2, 1, 3]
+            _apply_levels_(bounds, plan)
+            _apply_gamma_(bounds, plan)
+            plan.tone_low, plan.tone_high = bounds[:, 0:1], bounds[:, 1:2]
+        colors = _apply_tone_(colors, plan)
+
+    if cfg.auto_color:
+        ycbcr = torch.matmul(colors, _RGB_TO_YCBCR.to(device=x.device, dtype=x.dtype))
+        chroma = ycbcr[..., 1:3].squeeze(2)                  # [B, K, 2]
+        if cfg.snap_neutral_midtones:
+            Y = ycbcr[..., 0:1].squeeze(2)
+            mid = _weighted_quantile(chroma, weights, 0.5, valid=(Y > 0.2) & (Y < 0.8))
+            mid = torch.where(torch.isnan(mid), _weighted_quantile(chroma, weights, 0.5), mid)
         else:
-            def pct(ch, p):
-                if p == 0.0:
-                    return torch.min(ch, dim=(1, 2), keepdim=True).values
-                return (_percentiles_exact(ch, p / 100.0) if precision_mode == "Exact" else _percentiles_hist(ch, p / 100.0))
-            low = torch.cat([pct(rgb[..., i:i+1], shadow_pct) for i in range(3)], dim=-1)
-            def pct_hi(ch, p):
-                if p == 0.0:
-                    return torch.max(ch, dim=(1, 2), keepdim=True).values
-                return (_percentiles_exact(ch, 1.0 - (p / 100.0)) if precision_mode == "Exact" else _percentiles_hist(ch, 1.0 - (p / 100.0)))
-            high = torch.cat([pct_hi(rgb[..., i:i+1], highlight_pct) for i in range(3)], dim=-1)
-        stretched = _linear_stretch(rgb, low, high)
-        return stretched.clamp(0.0, 1.0)
-
-    # Monochromatic: stretch only luma
-    ycbcr = _rgb_to_ycbcr(rgb)
-    Y = ycbcr[..., 0:1]
-    if shadow_pct == 0.0 and highlight_pct == 0.0:
-        low = torch.min(Y, dim=(1, 2), keepdim=True).values
-        high = torch.max(Y, dim=(1, 2), keepdim=True).values
+            mid = (chroma * weights).sum(dim=1) / weights.sum(dim=1).clamp(min=1)
+            mid = mid.view(-1, 1, 1, 2)
+        plan.color_matrix, plan.color_offset = _color_shift(mid)
+    return plan
+
+
+def _apply_plan_(x, plan):
+    """Apply every stage of plan to x ([B, H, W, 3] float32), reusing its buffer."""
+    _apply_levels_(x, plan)
+    _apply_gamma_(x, plan)
+    x = _apply_tone_(x, plan)
+    return _apply_color_(x, plan)
+
+
+def _apply_levels_(x, plan):
+    if plan.levels_low is not None:
+        _stretch_(x, plan.levels_low, plan.levels_high)
+
+
+def _apply_gamma_(x, plan):
+    if plan.gamma is not None:
+        x.clamp_(min=plan.gamma_floor).pow_(plan.gamma).clamp_(0.0, 1.0)
+
+
+def _apply_tone_(x, plan):
+    if plan.tone_low is None:
+        return x
+    if not plan.tone_mono:
+        return _stretch_(x, plan.tone_low, plan.tone_high)
+
+    # Monochromatic: stretch only YCbCr luma and map back, i.e. the YCbCr round
+    # trip plus the luma change added equally to R, G and B.
+    Y = _ycbcr_luma(x)
+    delta = _stretch_(Y.clone(), plan.tone_low, plan.tone_high).sub_(Y)
+    del Y
+    out = torch.matmul(x, _YCBCR_ROUND_TRIP.to(device=x.device, dtype=x.dtype))
+    return out.add_(delta).clamp_(0.0, 1.0)
+
+
+def _apply_color_(x, plan):
+    if plan.color_matrix is None:
+        return x
+    B = x.shape[0]
+    out = torch.baddbmm(plan.color_offset, x.reshape(B, -1, 3), plan.color_matrix)
+    return out.view(x.shape).clamp_(0.0, 1.0)
+
+
+def _clip_bounds(x, shadow_pct, highlight_pct, precision_mode):
+    """Per-image, per-channel (low, high) after clipping the given percentages.
+
+    x: [B, H, W, C] — results: [B, 1, 1, C] each. A zero clip falls back to the
+    plain min/max; both percentiles share one histogram / selection pass.
+    """
+    lo_q = shadow_pct / 100.0
+    hi_q = 1.0 - (highlight_pct / 100.0)
+    low = torch.amin(x, dim=(1, 2), keepdim=True) if shadow_pct <= 0.0 else None
+    high = torch.amax(x, dim=(1, 2), keepdim=True) if highlight_pct <= 0.0 else None
+    if low is not None and high is not None:
+        return low, high
+
+    percentiles = _percentiles_exact if precision_mode == "Exact" else _percentiles_hist
+    if low is None and high is None:
+        return percentiles(x, (lo_q, hi_q))
+    if low is None:
+        low = percentiles(x, lo_q)
     else:
-        low = (_percentiles_exact(Y, shadow_pct / 100.0) if precision_mode == "Exact" else _percentiles_hist(Y, shadow_pct / 100.0)) if shadow_pct > 0.0 else torch.min(Y, dim=(1, 2), keepdim=True).values
-        high = (_percentiles_exact(Y, 1.0 - (highlight_pct / 100.0)) if precision_mode == "Exact" else _percentiles_hist(Y, 1.0 - (highlight_pct / 100.0))) if highlight_pct > 0.0 else torch.max(Y, dim=(1, 2), keepdim=True).values
+        high = percentiles(x, hi_q)
+    return low, high
 
-    Ys = _linear_stretch_scalar(Y, low, high)
-    ycbcr = torch.cat([Ys, ycbcr[..., 1:2], ycbcr[..., 2:3]], dim=-1)
-    out = _ycbcr_to_rgb(ycbcr)
-    return out.clamp(0.0, 1.0)
 
+def _color_params(x, snap_midtones):
+    """Neutralize the chroma cast by removing the mean (or midtone median) Cb/Cr.
 
+    Expressed as the YCbCr round-trip matrix with the chroma shift folded into
+    an offset, so applying it is a single affine pass.
+    """
+    ycbcr = torch.matmul(x, _RGB_TO_YCBCR.to(device=x.device, dtype=x.dtype))
+    if snap_midtones:
+        Y = ycbcr[..., 0:1]
+        mid = _median_masked(ycbcr[..., 1:3], (Y > 0.2) & (Y < 0.8))
+    else:
+        mid = torch.mean(ycbcr[..., 1:3], dim=(1, 2), keepdim=True)
+    del ycbcr
+    return _color_shift(mid)
 
 
-def _linear_stretch(x, low, high):
-    eps = 1e-6
-    return torch.clamp((x - low) / torch.clamp(high - low, min=eps), 0.0, 1.0)
+def _color_shift(mid):
+    """Matrix/offset pair that removes the chroma centre mid ([B, 1, 1, 2])."""
+    B = mid.shape[0]
+    shift = torch.cat([torch.zeros_like(mid[..., 0:1]), mid], dim=-1).view(B, 1, 3)
+    inverse = _YCBCR_TO_RGB.to(device=mid.device, dtype=mid.dtype)
+    matrix = _YCBCR_ROUND_TRIP.to(device=mid.device, dtype=mid.dtype).expand(B, 3, 3).contiguous()
+    return matrix, -(shift @ inverse)
 
 
-def _linear_stretch_scalar(x, low, high):
-    eps = 1e-6
-    return torch.clamp((x - low) / torch.clamp(high - low, min=eps), 0.0, 1.0)
+def _gamma_params(Ys):
+    """Per-image gamma that pulls the midtone luma median towards 0.5 — returns (floor, gamma).
+
+    Images without midtones (NaN median) or whose median is outside the
+    correctable range get gamma 1 and floor 0, i.e. are left untouched.
+    """
+    mid_mask = (Ys > 0.25) & (Ys < 0.75)
+    median = exact_quantiles(_to_1d(Ys), (0.5,), valid=_to_1d(mid_mask))[0].view(-1, 1, 1, 1)
+    return _gamma_from_median(median.to(Ys.dtype))
+
+
+def _gamma_from_median(median):
+    gamma = (math.log(0.5) / torch.log(median)).clamp(0.85, 1.15)
+    correct = (median > 0.35) & (median < 0.65)
+    gamma = torch.where(correct, gamma, torch.ones_like(gamma))
+    floor = torch.where(correct, torch.full_like(gamma, 1e-6), torch.zeros_like(gamma))
+    return floor, gamma
+
+
+def _median_masked(ch, msk):
+    """Per-image median of ch where msk is True; falls back to all pixels if mask is empty.
+
+    ch: [B, H, W, C], msk: [B, H, W, 1] — result: [B, 1, 1, C].
+    One batched masked selection serves the whole batch, each image ranked
+    against its own mask count, instead of boolean-indexing image by image.
+    """
+    B, C = ch.shape[0], ch.shape[-1]
+    valid = _to_1d(msk)
+    valid = valid | ~valid.any(dim=1, keepdim=True)
+    return exact_quantiles(_to_1d(ch), (0.5,), valid=valid)[0].to(ch.dtype).view(B, 1, 1, C)
 
 
 def _luma(rgb):
@@ -142,37 +305,133 @@ def _luma(rgb):
 
 
 def _percentiles_exact(x, q):
-    flat = _to_1d(x)
-    return torch.quantile(flat, q, dim=1, keepdim=True).view(x.shape[0], 1, 1, x.shape[-1])
+    """Exact percentile (torch.quantile semantics) for every image and channel.
+
+    x: [B, H, W, C]; q: a float or a sequence of floats — result: [B, 1, 1, C]
+    per quantile (a tuple when q is a sequence). Uses radix selection rather
+    than a sort, so it stays O(N) and has no input-size limit on large scans.
+    """
+    B, H, W, C = x.shape
+    qs = [float(v) for v in q] if isinstance(q, (list, tuple)) else [float(q)]
+    values = exact_quantiles(_to_1d(x), qs).to(x.dtype).view(len(qs), B, 1, 1, C)
+    if isinstance(q, (list, tuple)):
+        return tuple(values.unbind(0))
+    return values[0]
 
 
 def _percentiles_hist(x, q):
-    """Histogram-approximate percentile using torch.histc — O(B*C*bins) memory, not O(B*H*W*bins)."""
-    B, H, W, C = x.shape
-    flat = x.view(B, -1, C)
-    bins = 256
-    edges = torch.linspace(0, 1, steps=bins + 1, device=x.device, dtype=x.dtype)
-    centers = (edges[:-1] + edges[1:]) / 2.0
-    result = torch.zeros(B, 1, 1, C, device=x.device, dtype=x.dtype)
-    for b in range(B):
-        for c in range(C):
-            ch = flat[b, :, c].float()
-            # torch.histc is O(N) time, O(bins) memory — no one-hot expansion
-            counts = torch.histc(ch, bins=bins, min=0.0, max=1.0)
-            cdf = torch.cumsum(counts, dim=0)
-            cdf = cdf / cdf[-1].clamp(min=1.0)
-            idx = int(torch.argmax((cdf >= q).to(torch.int64)).item())
-            result[b, 0, 0, c] = centers[idx]
-    return result
-
-
-def _rgb_to_ycbcr(rgb):
-    # Expect rgb in [0,1]
-    r, g, b = rgb[..., 0:1], rgb[..., 1:2], rgb[..., 2:3]
-    Y = 0.299 * r + 0.587 * g + 0.114 * b
-    Cb = 0.5643 * (b - Y)
-    Cr = 0.7132 * (r - Y)
-    return torch.cat([Y, Cb, Cr], dim=-1)
+    """Histogram-approximate percentile for every image and channel at once.
+
+    x: [B, H, W, C]; q: a float or a sequence of floats — result: [B, 1, 1, C]
+    per quantile (a tuple when q is a sequence). All [B, C, bins] histograms are
+    built in one batched pass and every quantile is read from the same CDF, so
+    there is no per-sample loop and no host sync.
+    """
+    return _hist_quantiles(batched_histogram(_to_1d(x), _HIST_BINS), q, x.dtype)
+
+
+def _gather_stats(x):
+    """Collect _ImageStats for x ([B, H, W, 3]) in a single chunked read."""
+    flat = _to_1d(x)
+    B, N, _ = flat.shape
+    J = _JOINT_LEVELS
+    K = J ** 3
+    hist = torch.zeros(B, 4, _HIST_BINS, device=x.device, dtype=torch.int64)
+    low = torch.full((B, 4), float("inf"), device=x.device, dtype=x.dtype)
+    high = torch.full((B, 4), float("-inf"), device=x.device, dtype=x.dtype)
+    joint_count = torch.zeros(B * K, device=x.device, dtype=torch.int64)
+    joint_sum = torch.zeros(B * K, 3, device=x.device, dtype=torch.float32)
+    offsets = (torch.arange(B, device=x.device, dtype=torch.int64) * K).view(B, 1)
+
+    step = max(1, _STATS_CHUNK_ELEMS // B)
+    for start in range(0, N, step):
+        rgb = flat[:, start:start + step, :]
+        planes = torch.cat([_luma(rgb), rgb], dim=-1)        # [B, n, 4]
+        hist += batched_histogram(planes, _HIST_BINS)
+        low = torch.minimum(low, planes.amin(dim=1))
+        high = torch.maximum(high, planes.amax(dim=1))
+        del planes
+        q = (rgb * J).to(torch.int64).clamp_(0, J - 1)
+        idx = ((q[..., 0] * J + q[..., 1]) * J + q[..., 2] + offsets).view(-1)
+        joint_count += torch.bincount(idx, minlength=B * K)
+        joint_sum.index_add_(0, idx, rgb.reshape(-1, 3).float())
+
+    joint_count = joint_count.view(B, K)
+    joint_mean = (joint_sum.view(B, K, 3) / joint_count.clamp(min=1).unsqueeze(-1)).to(x.dtype)
+    return _ImageStats(hist, low.view(B, 1, 1, 4), high.view(B, 1, 1, 4), joint_count, joint_mean)
+
+
+def _hist_bounds(counts, low, high, shadow_pct, highlight_pct):
+    """_clip_bounds for precomputed [B, C, bins] counts and [B, 1, 1, C] extremes."""
+    if shadow_pct > 0.0 and highlight_pct > 0.0:
+        return _hist_quantiles(counts, (shadow_pct / 100.0, 1.0 - highlight_pct / 100.0), low.dtype)
+    if shadow_pct > 0.0:
+        low = _hist_quantiles(counts, shadow_pct / 100.0, low.dtype)
+    if highlight_pct > 0.0:
+        high = _hist_quantiles(counts, 1.0 - highlight_pct / 100.0, high.dtype)
+    return low, high
+
+
+def _hist_quantiles(counts, q, dtype=torch.float32):
+    """Read quantiles off [B, C, bins] counts — same result layout as _percentiles_hist."""
+    B, C, bins = counts.shape
+    cdf = torch.cumsum(counts, dim=-1)
+    total = cdf[..., -1:].clamp(min=1)
+
+    qs = [float(v) for v in q] if isinstance(q, (list, tuple)) else [float(q)]
+    qt = torch.tensor(qs, device=counts.device, dtype=torch.float64).view(1, 1, -1)
+    # First bin whose normalized CDF reaches q == number of bins still below it.
+    below = cdf.unsqueeze(-1).double() < (qt * total.double()).unsqueeze(-2)
+    idx = below.sum(dim=-2).clamp_(max=bins - 1)               # [B, C, Q]
+    centers = (torch.arange(bins, device=counts.device, dtype=dtype) + 0.5) / bins
+    values = centers[idx].permute(2, 0, 1).reshape(len(qs), B, 1, 1, C)
+    if isinstance(q, (list, tuple)):
+        return tuple(values.unbind(0))
+    return values[0]
+
+
+def _weighted_bounds(values, weights, shadow_pct, highlight_pct):
+    """_clip_bounds for a weighted sample: values [B, K, 1, C], weights [B, K, 1]."""
+    v = values.squeeze(2)
+    occupied = weights > 0
+    if shadow_pct > 0.0:
+        low = _weighted_quantile(v, weights, shadow_pct / 100.0)
+    else:
+        low = torch.where(occupied, v, float("inf")).amin(dim=1).view(v.shape[0], 1, 1, -1)
+    if highlight_pct > 0.0:
+        high = _weighted_quantile(v, weights, 1.0 - highlight_pct / 100.0)
+    else:
+        high = torch.where(occupied, v, float("-inf")).amax(dim=1).view(v.shape[0], 1, 1, -1)
+    return low, high
+
+
+def _weighted_quantile(values, weights, q, valid=None):
+    """Lower q-quantile of a weighted sample per image and channel.
+
+    values: [B, K, C] (or [B, K, 1, C]); weights: [B, K, 1]; valid: optional
+    bool mask shaped like values — result: [B, 1, 1, C], NaN where no weight
+    is selected.
+    """
+    if values.dim() == 4:
+        values = values.squeeze(2)
+        valid = valid.squeeze(2) if valid is not None else None
+    B, K, C = values.shape
+    w = weights.expand(B, K, C).double()
+    if valid is not None:
+        w = w * valid
+    order = values.argsort(dim=1)
+    cw = w.gather(1, order).cumsum(dim=1)
+    total = cw[:, -1:, :]
+    idx = (cw < q * total).sum(dim=1, keepdim=True).clamp_(max=K - 1)
+    out = values.gather(1, order.gather(1, idx))
+    out = out.masked_fill(total <= 0, float("nan"))
+    return out.view(B, 1, 1, C)
+
+
+def _stretch_(x, low, high):
+    """In-place linear stretch of [low, high] onto [0, 1]; returns x."""
+    eps = 1e-6
+    return x.sub_(low).div_(torch.clamp(high - low, min=eps)).clamp_(0.0, 1.0)
 
 
 def _to_1d(x):
@@ -180,12 +439,8 @@ def _to_1d(x):
     return x.view(B, -1, C)
 
 
-def _ycbcr_to_rgb(ycbcr):
-    Y, Cb, Cr = ycbcr[..., 0:1], ycbcr[..., 1:2], ycbcr[..., 2:3]
-    r = Y + 1.4020 * Cr
-    g = Y - 0.3441 * Cb - 0.7141 * Cr
-    b = Y + 1.7720 * Cb
-    return torch.cat([r, g, b], dim=-1)
+def _ycbcr_luma(rgb):
+    return (0.299 * rgb[..., 0:1]) + (0.587 * rgb[..., 1:2]) + (0.114 * rgb[..., 2:3])
 
 
 class AutoAdjustNode:
@@ -210,10 +465,21 @@ class AutoAdjustNode:
                 "snap_neutral_midtones": ("BOOLEAN", {"default": False}),
 
                 "flip_horizontal": ("BOOLEAN", {"default": False}),
-            }
+            },
+            "optional": {
+                "stats_resolution": (list(STATS_RESOLUTIONS), {
+                    "default": "Full",
+                    "tooltip": "Measure levels/tone/colour on an area-downsampled proxy, then apply the result at full resolution.",
+                }),
+                "stats_error_report": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Also run Exact precision at full resolution and report how far this output is from it.",
+                }),
+            },
         }
 
-    RETURN_TYPES = ("IMAGE",)
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("image", "stats_report")
     FUNCTION = "apply"
     CATEGORY = "PortraitUtils/Adjustment"
 
@@ -227,37 +493,158 @@ class AutoAdjustNode:
         auto_color, snap_neutral_midtones,
 
         flip_horizontal,
+        stats_resolution="Full",
+        stats_error_report=False,
     ):
         with torch.no_grad():
-            image = enforce_image_format(image, force_rgb=False)
-            has_alpha = image.shape[-1] == 4
-            
-            if image.shape[-1] == 1:
-                rgb = image.repeat(1, 1, 1, 3).to(dtype=torch.float32)
+            rgb, alpha = _split_alpha(image)
+
+            if precision not in ("Histogram (fast)", "Exact"):
+                precision = "Histogram (fast)"
+
+            cfg = _AdjustSettings(
+                precision,
+                auto_levels, levels_shadow_clip_pct, levels_highlight_clip_pct, levels_gamma_normalize,
+                auto_tone, tone_mode, tone_shadow_clip_pct, tone_highlight_clip_pct,
+                auto_color, snap_neutral_midtones,
+            )
+            proxy = stats_proxy(rgb, stats_resolution)
+            report = f"stats={stats_resolution} {proxy.shape[2]}x{proxy.shape[1]} precision={precision}"
+            exact = None
+            if stats_error_report and (proxy is not rgb or precision != "Exact"):
+                _, exact = _analyze_(rgb.clone(), replace(cfg, precision="Exact"))
+
+            # rgb and proxy are fresh copies, so the stages can run in place on them.
+            if proxy is not rgb:
+                plan = _analyze_(proxy, cfg)[0] if precision == "Exact" else _analyze_fast(proxy, cfg)
+                del proxy
+                rgb = _apply_plan_(rgb, plan)
+            elif precision == "Exact":
+                _, rgb = _analyze_(rgb, cfg)
             else:
-                rgb = image[..., :3].to(dtype=torch.float32)
-            
-            rgb = rgb.clamp(0.0, 1.0)
-            if has_alpha:
-                alpha = image[..., 3:4].to(dtype=torch.float32)
+                rgb = _apply_plan_(rgb, _analyze_fast(rgb, cfg))
+
+            if exact is not None:
+                report += " " + describe_proxy_error(rgb, exact)
+                del exact
+
+            return (_join_alpha(rgb, alpha, flip_horizontal), report)
+
+
+class AutoAdjustAnalyze:
+    """Measure an AutoAdjust correction once and emit it as reusable parameters.
+
+    The parameters are per image and resolution independent, so AutoAdjustApply
+    can replay them on upscaled or inpainted variants of the same subject.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        types = AutoAdjustNode.INPUT_TYPES()
+        types["required"].pop("flip_horizontal")
+        types["optional"].pop("stats_error_report")
+        return types
+
+    RETURN_TYPES = ("AUTO_ADJUST_PARAMS", "STRING")
+    RETURN_NAMES = ("params", "stats_report")
+    FUNCTION = "analyze"
+    CATEGORY = "PortraitUtils/Adjustment"
+
+    def analyze(
+        self,
+        image,
+        precision,
+
+        auto_levels, levels_shadow_clip_pct, levels_highlight_clip_pct, levels_gamma_normalize,
+        auto_tone, tone_mode, tone_shadow_clip_pct, tone_highlight_clip_pct,
+        auto_color, snap_neutral_midtones,
 
+        stats_resolution="Full",
+    ):
+        with torch.no_grad():
+            rgb, _ = _split_alpha(image)
             if precision not in ("Histogram (fast)", "Exact"):
                 precision = "Histogram (fast)"
 
-            rgb = _auto_levels(rgb, auto_levels, levels_shadow_clip_pct, levels_highlight_clip_pct, levels_gamma_normalize, precision)
-            rgb = _auto_tone(rgb, auto_tone, tone_mode, tone_shadow_clip_pct, tone_highlight_clip_pct, precision)
-            rgb = _auto_color(rgb, auto_color, snap_neutral_midtones)
+            cfg = _AdjustSettings(
+                precision,
+                auto_levels, levels_shadow_clip_pct, levels_highlight_clip_pct, levels_gamma_normalize,
+                auto_tone, tone_mode, tone_shadow_clip_pct, tone_highlight_clip_pct,
+                auto_color, snap_neutral_midtones,
+            )
+            proxy = stats_proxy(rgb, stats_resolution)
+            del rgb
+            plan = _analyze_(proxy, cfg)[0] if precision == "Exact" else _analyze_fast(proxy, cfg)
+            report = (
+                f"stats={stats_resolution} {proxy.shape[2]}x{proxy.shape[1]} precision={precision} "
+                f"images={proxy.shape[0]}"
+            )
+            return (plan, report)
+
+
+class AutoAdjustApply:
+    """Apply AutoAdjustAnalyze parameters to any same-content image, at any size."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "params": ("AUTO_ADJUST_PARAMS",),
+                "flip_horizontal": ("BOOLEAN", {"default": False}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "apply"
+    CATEGORY = "PortraitUtils/Adjustment"
+
+    def apply(self, image, params, flip_horizontal):
+        with torch.no_grad():
+            rgb, alpha = _split_alpha(image)
+            plan = _plan_for(params, rgb.shape[0], rgb.device)
+            rgb = _apply_plan_(rgb, plan)
+            return (_join_alpha(rgb, alpha, flip_horizontal),)
 
-            if flip_horizontal:
-                rgb = torch.flip(rgb, dims=[2])
-                if has_alpha:
-                    alpha = torch.flip(alpha, dims=[2])
 
-            out = rgb.clamp(0.0, 1.0)
-            if has_alpha:
-                out = torch.cat([out, alpha], dim=-1)
-                
-            return (out,)
+def _split_alpha(image):
+    """Standardize image to a fresh float32 RGB working copy — returns (rgb, alpha or None)."""
+    image = enforce_image_format(image, force_rgb=False)
+    if image.shape[-1] == 1:
+        rgb = image.repeat(1, 1, 1, 3).to(dtype=torch.float32)
+    else:
+        rgb = image[..., :3].to(dtype=torch.float32)
+    rgb = rgb.clamp(0.0, 1.0)
+    alpha = image[..., 3:4].to(dtype=torch.float32) if image.shape[-1] == 4 else None
+    return rgb, alpha
+
+
+def _join_alpha(rgb, alpha, flip_horizontal):
+    if flip_horizontal:
+        rgb = torch.flip(rgb, dims=[2])
+        if alpha is not None:
+            alpha = torch.flip(alpha, dims=[2])
+
+    out = rgb.clamp(0.0, 1.0)
+    if alpha is not None:
+        out = torch.cat([out, alpha], dim=-1)
+    return out
+
+
+def _plan_for(plan, batch, device):
+    """Move plan to device, broadcasting a single-image plan over the batch."""
+    moved = {}
+    for f in fields(plan):
+        value = getattr(plan, f.name)
+        if isinstance(value, torch.Tensor):
+            if value.shape[0] not in (1, batch):
+                raise ValueError(
+                    f"AutoAdjust params cover {value.shape[0]} images but the batch has {batch}; "
+                    "use params from a single image or from a batch of the same size"
+                )
+            value = value.to(device).expand(batch, *value.shape[1:])
+        moved[f.name] = value
+    return _AdjustPlan(**moved)
 
 # ============================================================
 # AutoColor Config (as before)
@@ -286,10 +673,14 @@ class AutoColorConfigNode:
 
 NODE_CLASS_MAPPINGS = {
     "AutoAdjustNode": AutoAdjustNode,
+    "AutoAdjustAnalyze": AutoAdjustAnalyze,
+    "AutoAdjustApply": AutoAdjustApply,
     "AutoColorConfigNode": AutoColorConfigNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "AutoAdjustNode": "Auto Adjust (Levels/Tone/Color)",
+    "AutoAdjustAnalyze": "Auto Adjust Analyze (Params)",
+    "AutoAdjustApply": "Auto Adjust Apply (Params)",
     "AutoColorConfigNode": "AutoColor Config",
 }
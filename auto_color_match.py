@@ -1,7 +1,24 @@
 from __future__ import annotations
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
 import torch
 import torch.nn.functional as F
-from .image_utils import enforce_image_format
+from PIL import Image, ImageOps
+
+from .color_lut import LUT_SIZES, identity_lut
+from .image_utils import (
+    STATS_RESOLUTIONS,
+    batched_histogram,
+    describe_proxy_error,
+    enforce_image_format,
+    resolve_output_path,
+    stats_proxy,
+)
 
 # ---------------------------
 # sRGB <-> Linear helpers
@@ -38,50 +55,80 @@ def _get_matrix(name: str, src: torch.Tensor, device, dtype) -> torch.Tensor:
         _MATRIX_CACHE[key] = src.to(device=device, dtype=dtype)
     return _MATRIX_CACHE[key]
 
-def rgb_to_lab(rgb):  # [B,H,W,3] in 0..1 sRGB
-    B,H,W,C = rgb.shape
-    M = _get_matrix("rgb2xyz", _M_RGB2XYZ, rgb.device, rgb.dtype)
-    # sRGB -> linear -> XYZ
-    lin = srgb_to_linear(rgb)
-    xyz = torch.einsum('bhwc,cd->bhwd', lin, M)
-    # Normalize by white point
-    x = xyz[...,0] / _Xn
-    y = xyz[...,1] / _Yn
-    z = xyz[...,2] / _Zn
-    eps = 216/24389
-    kappa = 24389/27
-
-    def f(t):
-        return torch.where(t > eps, t.pow(1/3), (kappa * t + 16) / 116)
-
-    fx, fy, fz = f(x), f(y), f(z)
-    L = 116*fy - 16
-    a = 500*(fx - fy)
-    b = 200*(fy - fz)
-    return torch.stack([L, a, b], dim=-1)  # [B,H,W,3]
-
-def lab_to_rgb(lab):  # [B,H,W,3]
-    L, a, b = lab[...,0], lab[...,1], lab[...,2]
-    fy = (L + 16)/116
-    fx = fy + a/500
-    fz = fy - b/200
-
-    eps = 216/24389
-    kappa = 24389/27
-
-    def finv(ft):
-        t3 = ft**3
-        return torch.where(t3 > eps, t3, (116*ft - 16)/kappa)
-
-    xr, yr, zr = finv(fx), finv(fy), finv(fz)
-    X = xr * _Xn
-    Y = yr * _Yn
-    Z = zr * _Zn
-    xyz = torch.stack([X,Y,Z], dim=-1)
-    M = _get_matrix("xyz2rgb", _M_XYZ2RGB, lab.device, lab.dtype)
-    lin = torch.einsum('bhwc,cd->bhwd', xyz, M)
-    srgb = linear_to_srgb(lin).clamp(0,1)
-    return srgb
+_LAB_EPS = 216/24389
+_LAB_KAPPA = 24389/27
+_WHITE = torch.tensor([_Xn, _Yn, _Zn], dtype=torch.float32)
+# White-point normalisation folded into the XYZ matrices, and the f() -> Lab
+# step written as an affine map: lab = f @ _M_F2LAB + [-16, 0, 0].
+_M_RGB2XYZN = _M_RGB2XYZ / _WHITE
+_M_XYZN2RGB = _WHITE.view(3, 1) * _M_XYZ2RGB
+_M_F2LAB = torch.tensor([[  0.0,  500.0,    0.0],
+                         [116.0, -500.0,  200.0],
+                         [  0.0,    0.0, -200.0]], dtype=torch.float32)
+_M_LAB2F = torch.tensor([[1/116, 1/116,  1/116],
+                         [1/500,   0.0,    0.0],
+                         [  0.0,   0.0, -1/200]], dtype=torch.float32)
+
+# ---------------------------
+# Chunked conversion engine
+# ---------------------------
+# Conversions stream over blocks of pixels so the temporaries of the fused
+# linearize -> XYZ -> Lab chain (and its inverse) stay within a fixed budget
+# instead of scaling with the batch. Blocks are whole images when they fit,
+# otherwise pixel ranges of a single image.
+LAB_CHUNK_MB = 256
+# Rough peak of live float values per pixel inside one fused conversion.
+_LAB_FLOATS_PER_PIXEL = 24
+_MIN_CHUNK_PIXELS = 4096
+
+def _chunk_pixels(x, chunk_mb=None):
+    budget = int(chunk_mb or LAB_CHUNK_MB) << 20
+    return max(_MIN_CHUNK_PIXELS, budget // (_LAB_FLOATS_PER_PIXEL * x.element_size()))
+
+def _pixel_chunks(batch, pixels, step):
+    """Yield (b0, b1, p0, p1) blocks covering a [batch, pixels] grid."""
+    if step >= pixels:
+        per = max(1, step // max(pixels, 1))
+        for b0 in range(0, batch, per):
+            yield b0, min(batch, b0 + per), 0, pixels
+    else:
+        for b in range(batch):
+            for p0 in range(0, pixels, step):
+                yield b, b + 1, p0, min(pixels, p0 + step)
+
+def _rgb_rows_to_lab(rgb):
+    # rgb: [..., 3] sRGB in 0..1
+    dev, dt = rgb.device, rgb.dtype
+    xyz = srgb_to_linear(rgb) @ _get_matrix("rgb2xyzn", _M_RGB2XYZN, dev, dt)
+    f = torch.where(xyz > _LAB_EPS, xyz.pow(1/3), (_LAB_KAPPA * xyz + 16) / 116)
+    del xyz
+    lab = f @ _get_matrix("f2lab", _M_F2LAB, dev, dt)
+    lab[..., 0] -= 16
+    return lab
+
+def _lab_rows_to_rgb(lab):
+    dev, dt = lab.device, lab.dtype
+    f = lab @ _get_matrix("lab2f", _M_LAB2F, dev, dt)
+    f += 16/116
+    t3 = f.pow(3)
+    xyz = torch.where(t3 > _LAB_EPS, t3, (116 * f - 16) / _LAB_KAPPA)
+    del f, t3
+    lin = xyz @ _get_matrix("xyzn2rgb", _M_XYZN2RGB, dev, dt)
+    return linear_to_srgb(lin).clamp_(0, 1)
+
+def _convert_chunked(x, fn, chunk_mb=None):
+    B = x.shape[0]
+    flat = x.reshape(B, -1, 3)
+    out = torch.empty_like(flat)
+    for b0, b1, p0, p1 in _pixel_chunks(B, flat.shape[1], _chunk_pixels(x, chunk_mb)):
+        out[b0:b1, p0:p1] = fn(flat[b0:b1, p0:p1])
+    return out.view(x.shape)
+
+def rgb_to_lab(rgb, chunk_mb=None):  # [B,H,W,3] in 0..1 sRGB
+    return _convert_chunked(rgb, _rgb_rows_to_lab, chunk_mb)
+
+def lab_to_rgb(lab, chunk_mb=None):  # [B,H,W,3]
+    return _convert_chunked(lab, _lab_rows_to_rgb, chunk_mb)
 
 # ---------------------------
 # Utility
@@ -91,62 +138,394 @@ def lab_to_rgb(lab):  # [B,H,W,3]
 def resize_bhwc(x, h, w, mode='bilinear'):
     return F.interpolate(x.permute(0,3,1,2), size=(h,w), mode=mode, align_corners=False).permute(0,2,3,1)
 
-def luminance(img):
-    # Rec.709 luma
-    return 0.2126*img[...,0] + 0.7152*img[...,1] + 0.0722*img[...,2]
-
-def per_image_mean_std(x):
-    # x: [B,H,W,3]
-    B = x.shape[0]
-    flat = x.view(B, -1, 3)
-    mean = flat.mean(dim=1, keepdim=True)
-    std  = flat.std (dim=1, unbiased=False, keepdim=True).clamp_min(1e-6)
-    return mean, std
-
 # ---------------------------
 # Methods
 # ---------------------------
-def wb_grayworld(img):
+# Every method reduces to per-image parameters (white-balance gains and Lab
+# mean/std) estimated by _estimate_params and applied by _apply_params, so the
+# statistics can come from a smaller proxy than the image being corrected.
+
+@dataclass
+class _MatchParams:
+    """Per-image colour-match transform, independent of the image resolution.
+
+    gains: [B,1,1,3] white-balance multipliers (None = no white balance).
+    src_mean/src_std/ref_mean/ref_std: [B,1,1,3] Lab statistics for the
+    Reinhard transfer (None = no transfer); l_only restricts it to L.
+    curves: [B,3,bins] per-channel transfer curves for histogram matching.
+    """
+
+    gains: Optional[torch.Tensor] = None
+    src_mean: Optional[torch.Tensor] = None
+    src_std: Optional[torch.Tensor] = None
+    ref_mean: Optional[torch.Tensor] = None
+    ref_std: Optional[torch.Tensor] = None
+    l_only: bool = False
+    curves: Optional[torch.Tensor] = None
+
+
+def _grayworld_gains(img):
     # Scale channels so mean becomes gray.
     # Clamp the per-channel mean away from zero to prevent inf gains when a
     # channel is pure black, then cap gains to a reasonable range.
     B = img.shape[0]
     mean = img.view(B, -1, 3).mean(dim=1)          # [B, 3]
     gray = mean.mean(dim=1, keepdim=True)           # [B, 1]
-    gains = (gray / mean.clamp_min(1e-6)).clamp(0.5, 2.0).view(B, 1, 1, 3)
-    return (img * gains).clamp(0, 1)
-
-def wb_highlight(img, percentile=95.0):
+    return (gray / mean.clamp_min(1e-6)).clamp(0.5, 2.0).view(B, 1, 1, 3)
+
+# Luma histogram resolution for the white-patch threshold: ~1/4096 wide bins,
+# interpolated within the bin, so the threshold lands well below 8-bit steps.
+_WB_HIST_BINS = 4096
+_LUMA_709 = torch.tensor([0.2126, 0.7152, 0.0722], dtype=torch.float32)
+
+def _highlight_threshold(Y, q, exact=False):
+    """Per-image q-quantile of luma Y [B,N] -> [B,1].
+
+    The default reads it off one batched histogram/CDF pass; exact=True gives
+    torch.quantile's value.
+    """
+    B, N = Y.shape
+    if exact:
+        # torch.quantile's linear interpolation from one or two O(N) selections
+        # (torch.quantile itself sorts and rejects inputs over 2**24 elements).
+        pos = q * (N - 1)
+        k = int(pos)
+        lo = torch.kthvalue(Y, k + 1, dim=1, keepdim=True).values
+        if pos == k or k + 1 >= N:
+            return lo
+        hi = torch.kthvalue(Y, k + 2, dim=1, keepdim=True).values
+        return torch.lerp(lo, hi, pos - k)
+    counts = batched_histogram(Y.unsqueeze(-1), _WB_HIST_BINS)[:, 0].double()  # [B, bins]
+    cdf = counts.cumsum(dim=-1)
+    rank = torch.full((B, 1), q * (N - 1), dtype=torch.float64, device=Y.device)
+    idx = torch.searchsorted(cdf, rank, right=True).clamp_(max=_WB_HIST_BINS - 1)
+    in_bin = counts.gather(1, idx)
+    below = cdf.gather(1, idx) - in_bin
+    frac = ((rank - below + 0.5) / in_bin.clamp_min(1.0)).clamp_(0.0, 1.0)
+    return ((idx + frac) / _WB_HIST_BINS).to(Y.dtype)
+
+def _highlight_gains(img, percentile=95.0, exact=False):
     # use brightest-percent luminance pixels as "white patch"
-    B,H,W,_ = img.shape
-    Y = luminance(img).view(B, -1)
-    thr = torch.quantile(Y, percentile/100.0, dim=1, keepdim=True)  # [B,1]
-    mask = (Y >= thr).view(B,H,W,1)
-    # avoid empty mask
-    eps = 1e-6
-    sel = img * mask
-    count = mask.sum(dim=(1,2,3), keepdim=True).clamp_min(1.0)
-    mean_sel = sel.sum(dim=(1,2,3), keepdim=True) / count  # [B,1,1,3]
+    B = img.shape[0]
+    rgb = img.reshape(B, -1, 3)
+    Y = rgb @ _get_matrix("luma709", _LUMA_709, img.device, img.dtype)  # [B,N], one pass
+    thr = _highlight_threshold(Y, percentile/100.0, exact)  # [B,1]
+    mask = (Y >= thr).to(img.dtype)
+    # avoid empty mask; masked channel sums via one bmm instead of img * mask
+    count = mask.sum(dim=1).view(B, 1, 1, 1).clamp_min(1.0)
+    sums = torch.bmm(mask.unsqueeze(1), rgb)  # [B,1,3]
+    mean_sel = sums.sum(dim=2).view(B, 1, 1, 1) / count
     target_white = torch.ones_like(mean_sel) * 0.95  # bring selected whites near 95% to avoid clipping
-    gains = (target_white / mean_sel).clamp(0.5, 2.0)
-    return (img * gains).clamp(0,1)
+    return (target_white / mean_sel).clamp(0.5, 2.0)
 
-def reinhard_match(src, ref, l_only=False):
-    # Convert to Lab, match mean/std
-    src_lab = rgb_to_lab(src)
-    ref_lab = rgb_to_lab(ref)
-    src_mean, src_std = per_image_mean_std(src_lab)
-    ref_mean, ref_std = per_image_mean_std(ref_lab)
+def _apply_gains(img, gains):
+    if gains is None:
+        return img
+    return (img * gains).clamp(0, 1)
 
-    if l_only:
+def _gain_rows(rows, gains, b0, b1):
+    if gains is None:
+        return rows
+    # gains are [B,1,1,3], or [B,1,1,1] for the highlight white patch
+    if gains.shape[0] == 1:
+        b0, b1 = 0, 1
+    return (rows * gains[b0:b1].reshape(b1 - b0, 1, -1)).clamp(0, 1)
+
+def _lab_mean_std(img, gains=None, chunk_mb=None):
+    """Per-image Lab mean/std ([B,1,1,3]) of the (optionally gain-corrected)
+    image, accumulated chunk by chunk in float64."""
+    B = img.shape[0]
+    flat = img.reshape(B, -1, 3)
+    n = flat.shape[1]
+    s1 = torch.zeros(B, 3, dtype=torch.float64, device=img.device)
+    s2 = torch.zeros_like(s1)
+    for b0, b1, p0, p1 in _pixel_chunks(B, n, _chunk_pixels(img, chunk_mb)):
+        lab = _rgb_rows_to_lab(_gain_rows(flat[b0:b1, p0:p1], gains, b0, b1))
+        s1[b0:b1] += lab.sum(dim=1, dtype=torch.float64)
+        s2[b0:b1] += lab.square().sum(dim=1, dtype=torch.float64)
+    mean = s1 / n
+    std = (s2 / n - mean.square()).clamp_min(0.0).sqrt().clamp_min(1e-6)
+    return mean.to(img.dtype).view(B, 1, 1, 3), std.to(img.dtype).view(B, 1, 1, 3)
+
+def _reinhard_affine(params):
+    # (lab - src_mean) / src_std * ref_std + ref_mean as lab * scale + shift
+    scale = params.ref_std / params.src_std
+    shift = params.ref_mean - params.src_mean * scale
+    if params.l_only:
         # match L only
-        L = (src_lab[...,0:1] - src_mean[...,0:1]) / src_std[...,0:1] * ref_std[...,0:1] + ref_mean[...,0:1]
-        out_lab = torch.cat([L, src_lab[...,1:],], dim=-1)
+        keep = torch.tensor([1.0, 0.0, 0.0], dtype=scale.dtype, device=scale.device)
+        scale = scale * keep + (1 - keep)
+        shift = shift * keep
+    B = scale.shape[0]
+    return scale.view(B, 1, 3), shift.view(B, 1, 3)
+
+def _reinhard_apply(img, params, chunk_mb=None):
+    """Gains (if any), Lab transfer and the inverse conversion fused per chunk."""
+    B = img.shape[0]
+    flat = img.reshape(B, -1, 3)
+    out = torch.empty_like(flat)
+    scale, shift = (t.expand(B, 1, 3) for t in _reinhard_affine(params))
+    for b0, b1, p0, p1 in _pixel_chunks(B, flat.shape[1], _chunk_pixels(img, chunk_mb)):
+        lab = _rgb_rows_to_lab(_gain_rows(flat[b0:b1, p0:p1], params.gains, b0, b1))
+        lab.mul_(scale[b0:b1]).add_(shift[b0:b1])
+        out[b0:b1, p0:p1] = _lab_rows_to_rgb(lab)
+    return out.view(img.shape)
+
+# ---------------------------
+# Histogram matching
+# ---------------------------
+# Per-channel CDF matching reduced to 1-D curves sampled per histogram bin, so
+# estimating costs one batched histogram and applying costs one gather.
+_REF_HIST_BINS = 1024
+HISTOGRAM_BINS = ["256", "1024"]
+
+def _rebin(counts, bins):
+    """Sum [..., _REF_HIST_BINS] counts down to `bins` (a divisor)."""
+    return counts.reshape(*counts.shape[:-1], bins, -1).sum(dim=-1)
+
+def _histogram_curves(src_counts, ref_counts):
+    """[B,3,bins] curves mapping each source bin to the reference value at the same CDF position."""
+    src = src_counts.double()
+    ref = ref_counts.double().expand(src.shape[0], -1, -1).contiguous()
+    bins = src.shape[-1]
+    # Source bins sit at their mid-bin CDF; the reference CDF is known at the
+    # upper bin edges and inverted linearly within the bin.
+    src_cdf = (src.cumsum(dim=-1) - 0.5 * src) / src.sum(dim=-1, keepdim=True).clamp_min(1.0)
+    ref_cdf = ref.cumsum(dim=-1) / ref.sum(dim=-1, keepdim=True).clamp_min(1.0)
+    idx = torch.searchsorted(ref_cdf, src_cdf).clamp_(max=bins - 1)
+    hi = ref_cdf.gather(-1, idx)
+    lo = torch.where(idx > 0, ref_cdf.gather(-1, (idx - 1).clamp(min=0)), torch.zeros_like(hi))
+    frac = ((src_cdf - lo) / (hi - lo).clamp_min(1e-12)).clamp_(0.0, 1.0)
+    return ((idx + frac) / bins).float()
+
+def _apply_curves(img, curves, chunk_mb=None):
+    """Look every channel value up in its image's curve: one gather per chunk."""
+    B = img.shape[0]
+    bins = curves.shape[-1]
+    table = curves.to(device=img.device, dtype=img.dtype).expand(B, 3, bins).reshape(-1)
+    offsets = (torch.arange(B * 3, device=img.device, dtype=torch.int64) * bins).view(B, 1, 3)
+    flat = img.reshape(B, -1, 3)
+    out = torch.empty_like(flat)
+    for b0, b1, p0, p1 in _pixel_chunks(B, flat.shape[1], _chunk_pixels(img, chunk_mb)):
+        idx = (flat[b0:b1, p0:p1] * bins).to(torch.int64).clamp_(0, bins - 1)
+        idx += offsets[b0:b1]
+        out[b0:b1, p0:p1] = table[idx]
+    return out.view(img.shape)
+
+def _estimate_params(src, ref_stats, method, percentile, chunk_mb=None, exact_threshold=False,
+                     histogram_bins=1024):
+    """ref_stats: callable taking "lab" (-> reference Lab (mean, std)) or "hist"
+    (-> reference RGB counts [R,3,1024]); only called when the method needs
+    the reference."""
+    params = _MatchParams()
+    # 1) white balance / base correction
+    if method == "wb_grayworld":
+        params.gains = _grayworld_gains(src)
+    elif method in ("wb_highlight", "wb_highlight+reinhard"):
+        params.gains = _highlight_gains(src, percentile=float(percentile), exact=exact_threshold)
+
+    # 2) color match, measured on the white-balanced source
+    if method in ("reinhard_lab", "lab_l_only", "wb_highlight+reinhard"):
+        params.src_mean, params.src_std = _lab_mean_std(src, params.gains, chunk_mb)
+        params.ref_mean, params.ref_std = ref_stats("lab")
+        params.l_only = method == "lab_l_only"
+    elif method == "histogram_match":
+        B = src.shape[0]
+        src_counts = batched_histogram(src.reshape(B, -1, 3), histogram_bins)
+        ref_counts = _rebin(ref_stats("hist").to(src.device), histogram_bins)
+        params.curves = _histogram_curves(src_counts, ref_counts)
+    return params
+
+def _apply_params(src, params, chunk_mb=None):
+    if params.curves is not None:
+        return _apply_curves(src, params.curves, chunk_mb)
+    if params.src_mean is None:
+        return _apply_gains(src, params.gains)
+    return _reinhard_apply(src, params, chunk_mb)
+
+def _bake_lut(params, size, strength, clip_gamut, batch, device, chunk_mb=None):
+    """Sample the whole transform (gains, Lab transfer, strength blend) on an
+    identity grid, giving a COLOR_LUT [batch, S, S, S, 3]."""
+    grid = identity_lut(size, device=device).view(1, size * size, size, 3)
+    grid = grid.expand(batch, -1, -1, -1).contiguous()
+    out = (1 - strength) * grid + strength * _apply_params(grid, params, chunk_mb)
+    if clip_gamut:
+        out = out.clamp(0, 1)
+    return out.view(batch, size, size, size, 3)
+
+# ---------------------------
+# Reference batching
+# ---------------------------
+# Reference statistics are always measured once for the whole reference batch
+# ([R,...]); the mode only decides how they line up with the image batch.
+REFERENCE_MODES = ["auto", "broadcast", "paired", "average"]
+
+def _resolve_reference(stats, mode, batch):
+    """Map per-reference statistics — Lab (mean, std) [R,1,1,3] or histogram
+    counts [R,3,bins] — onto `batch` images.
+
+    broadcast: one reference for every image; paired: reference i for image i;
+    average: all references pooled into one target (statistics of every pixel);
+    auto: broadcast for one reference, paired for a matching batch.
+    Returns (stats, resolved_mode).
+    """
+    R = (stats[0] if isinstance(stats, tuple) else stats).shape[0]
+    if mode == "auto":
+        if R == 1:
+            mode = "broadcast"
+        elif R == batch:
+            mode = "paired"
+        else:
+            raise ValueError(
+                f"AutoWBColorMatch: {R} references for {batch} images; pass 1 or {batch} "
+                "references, or set reference_mode to 'average'."
+            )
+    if mode == "broadcast" and R != 1:
+        raise ValueError(f"AutoWBColorMatch: reference_mode 'broadcast' needs a single reference, got {R}.")
+    if mode == "paired" and R != batch:
+        raise ValueError(f"AutoWBColorMatch: reference_mode 'paired' needs {batch} references, got {R}.")
+    if mode == "average" and R > 1:
+        if not isinstance(stats, tuple):
+            return stats.sum(dim=0, keepdim=True), mode
+        # Pool from the per-reference moments (all references share one size).
+        mean, std = stats
+        m64 = mean.double()
+        second = (std.double().square() + m64.square()).mean(dim=0, keepdim=True)
+        pooled = m64.mean(dim=0, keepdim=True)
+        std = (second - pooled.square()).clamp_min(0.0).sqrt().clamp_min(1e-6).to(std.dtype)
+        stats = (pooled.to(mean.dtype), std)
+    return stats, mode
+
+# ---------------------------
+# Reference statistics cache
+# ---------------------------
+# The reference is usually the same frame for hundreds of executions, so its
+# Lab statistics are kept keyed by a cheap fingerprint of the tensor plus how
+# it was measured. Oldest entries are evicted FIFO once the cap is reached.
+_REF_STATS_CACHE: dict = {}
+_MAX_REF_CACHE_ENTRIES = 32
+_REF_CACHE_COUNTERS = {"hits": 0, "misses": 0}
+_FINGERPRINT_SAMPLES = 4096
+
+def _evict_oldest(d: dict, max_entries: int) -> None:
+    """Remove oldest keys from a plain dict when it exceeds max_entries."""
+    while len(d) >= max_entries:
+        del d[next(iter(d))]
+
+def _fingerprint(t):
+    # Hash a fixed scatter of samples (multiplicative hashing avoids lining up
+    # with rows or columns) plus per-channel float64 sum and sum of squares over
+    # the whole tensor, so an edit that misses every sample still changes the key.
+    flat = t.reshape(-1)
+    n = flat.numel()
+    idx = (torch.arange(_FINGERPRINT_SAMPLES, dtype=torch.int64) * 2654435761) % max(n, 1)
+    sample = flat[idx.to(flat.device)].float().cpu().numpy()
+    channels = t.reshape(-1, t.shape[-1]) if t.dim() > 1 else flat.reshape(-1, 1)
+    sums = channels.sum(dim=0, dtype=torch.float64)
+    squares = torch.linalg.vector_norm(channels, dim=0, dtype=torch.float64).square()
+    moments = torch.cat([sums, squares]).cpu().numpy()
+    digest = hashlib.sha1(sample.tobytes() + moments.tobytes()).hexdigest()
+    return (tuple(t.shape), str(t.dtype), str(t.device), digest)
+
+def _reference_stats(ref, how, prepare, kind="lab", chunk_mb=None):
+    """Lab (mean, std) or RGB histogram counts of prepare(ref), reused when this
+    reference was measured the same way."""
+    key = (_fingerprint(ref), how, kind)
+    cached = _REF_STATS_CACHE.get(key)
+    if cached is not None:
+        _REF_CACHE_COUNTERS["hits"] += 1
+        return cached
+    _REF_CACHE_COUNTERS["misses"] += 1
+    measured = prepare(ref)
+    if kind == "hist":
+        stats = batched_histogram(measured.reshape(measured.shape[0], -1, 3), _REF_HIST_BINS)
     else:
-        out_lab = (src_lab - src_mean) / src_std * ref_std + ref_mean
+        stats = _lab_mean_std(measured, chunk_mb=chunk_mb)
+    _evict_oldest(_REF_STATS_CACHE, _MAX_REF_CACHE_ENTRIES)
+    _REF_STATS_CACHE[key] = stats
+    return stats
 
-    out = lab_to_rgb(out_lab).clamp(0,1)
-    return out
+# ---------------------------
+# Reference colour profiles
+# ---------------------------
+# A profile is a reference set reduced to its pooled Lab statistics (plus the
+# set's own white-patch gains, for reference), stored as a small JSON file so
+# the reference costs nothing at match time.
+_PROFILE_KIND = "portraitutils.color_profile"
+_PROFILE_VERSION = 1
+_PROFILE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+_PROFILE_CACHE: dict = {}
+_MAX_PROFILE_CACHE_ENTRIES = 16
+
+def _load_rgb(path):
+    """[1,H,W,3] float32 RGB of an image file, EXIF orientation applied."""
+    with Image.open(path) as raw:
+        img = ImageOps.exif_transpose(raw)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        array = np.asarray(img, dtype=np.float32) / 255.0
+    return torch.from_numpy(array).unsqueeze(0)
+
+def build_color_profile(paths, stats_resolution="1 MP", percentile=95.0, chunk_mb=None):
+    """Pool Lab mean/std over every pixel of every image (each measured on its
+    stats proxy) one image at a time, so memory stays at one image."""
+    count = 0
+    hist = torch.zeros(3, _REF_HIST_BINS, dtype=torch.int64)
+    s1 = torch.zeros(3, dtype=torch.float64)
+    s2 = torch.zeros(3, dtype=torch.float64)
+    gain_sum = 0.0
+    for path in paths:
+        img = stats_proxy(_load_rgb(path), stats_resolution)
+        n = img.shape[1] * img.shape[2]
+        mean, std = _lab_mean_std(img, chunk_mb=chunk_mb)
+        mean, std = mean.view(3).double(), std.view(3).double()
+        s1 += n * mean
+        s2 += n * (std.square() + mean.square())
+        gain_sum += float(_highlight_gains(img, percentile).mean())
+        hist += batched_histogram(img.reshape(1, -1, 3), _REF_HIST_BINS)[0]
+        count += n
+    if count == 0:
+        raise ValueError("BuildColorProfile: no reference images found.")
+    mean = s1 / count
+    std = (s2 / count - mean.square()).clamp_min(0.0).sqrt().clamp_min(1e-6)
+    return {
+        "kind": _PROFILE_KIND,
+        "version": _PROFILE_VERSION,
+        "images": len(paths),
+        "pixels": int(count),
+        "stats_resolution": stats_resolution,
+        "percentile": float(percentile),
+        "lab_mean": [float(v) for v in mean],
+        "lab_std": [float(v) for v in std],
+        "highlight_gain": gain_sum / len(paths),
+        "rgb_hist_bins": _REF_HIST_BINS,
+        "rgb_hist": [[round(float(v), 9) for v in row] for row in hist.double() / count],
+        "sources": [os.path.basename(p) for p in paths],
+    }
+
+def _read_profile(path):
+    """Parsed profile for path, cached by modification time."""
+    if not os.path.isfile(path):
+        raise ValueError(f"AutoWBColorMatch: profile not found: {path}")
+    key = (path, os.path.getmtime(path))
+    profile = _PROFILE_CACHE.get(key)
+    if profile is None:
+        with open(path, "r", encoding="utf-8") as handle:
+            profile = json.load(handle)
+        if profile.get("kind") != _PROFILE_KIND:
+            raise ValueError(f"AutoWBColorMatch: {path} is not a colour profile.")
+        _evict_oldest(_PROFILE_CACHE, _MAX_PROFILE_CACHE_ENTRIES)
+        _PROFILE_CACHE[key] = profile
+    return profile
+
+def _profile_stats(profile, kind, device, dtype):
+    if kind == "hist":
+        if profile.get("rgb_hist_bins") != _REF_HIST_BINS:
+            raise ValueError("AutoWBColorMatch: this profile has no histograms; rebuild it for histogram_match.")
+        return torch.tensor(profile["rgb_hist"], device=device, dtype=torch.float64).view(1, 3, _REF_HIST_BINS)
+    mean = torch.tensor(profile["lab_mean"], device=device, dtype=dtype).view(1, 1, 1, 3)
+    std = torch.tensor(profile["lab_std"], device=device, dtype=dtype).view(1, 1, 1, 3)
+    return mean, std
 
 # ---------------------------
 # Comfy node
@@ -157,13 +536,13 @@ class AutoWBColorMatch:
         return {
             "required": {
                 "image": ("IMAGE",),
-                "reference": ("IMAGE",),
                 "method": ([
                     "wb_grayworld",
                     "wb_highlight",
                     "reinhard_lab",
                     "lab_l_only",
                     "wb_highlight+reinhard",
+                    "histogram_match",
                 ], {"default": "wb_highlight+reinhard"}),
                 "percentile": ("FLOAT", {"default": 95.0, "min": 80.0, "max": 99.9, "step": 0.1}),
                 "strength": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0, "step": 0.01}),
@@ -171,61 +550,192 @@ class AutoWBColorMatch:
                 "force_size": ("BOOLEAN", {"default": False}),
                 "target_width": ("INT", {"default": 1440, "min": 16, "max": 8192, "step": 1}),
                 "target_height": ("INT", {"default": 1080, "min": 16, "max": 8192, "step": 1}),
-            }
+            },
+            "optional": {
+                "reference": ("IMAGE",),
+                "profile_path": ("STRING", {
+                    "default": "",
+                    "tooltip": "Colour profile JSON from Build Color Profile; used instead of a reference image. Relative paths are read from the ComfyUI output directory.",
+                }),
+                "stats_resolution": (list(STATS_RESOLUTIONS), {
+                    "default": "Full",
+                    "tooltip": "Measure white balance and Lab statistics on an area-downsampled proxy, then apply the correction at full resolution.",
+                }),
+                "stats_error_report": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Also estimate at full resolution and report how far this output (measured on the stats proxy or the force_size working size) is from it.",
+                }),
+                "reference_mode": (REFERENCE_MODES, {
+                    "default": "auto",
+                    "tooltip": "How reference frames pair with images: one for all (broadcast), one per image (paired), or pooled into one target (average). auto picks broadcast or paired from the batch sizes.",
+                }),
+                "histogram_bins": (HISTOGRAM_BINS, {
+                    "default": "1024",
+                    "tooltip": "Resolution of the per-channel transfer curves used by histogram_match.",
+                }),
+                "lut_size": (["off"] + LUT_SIZES, {
+                    "default": "off",
+                    "tooltip": "Grid size of the baked COLOR_LUT output (33 or 65 points per axis); off skips baking and outputs no LUT.",
+                }),
+                "highlight_threshold": (["histogram", "exact"], {
+                    "default": "histogram",
+                    "tooltip": "How the wb_highlight white-patch cut-off is found: a fast luma histogram, or an exact per-pixel quantile.",
+                }),
+                "lab_chunk_mb": ("INT", {
+                    "default": LAB_CHUNK_MB, "min": 16, "max": 16384, "step": 16,
+                    "tooltip": "Working-memory budget for the Lab conversions; large batches are processed in chunks of this size.",
+                }),
+            },
         }
 
-    RETURN_TYPES = ("IMAGE",)
+    RETURN_TYPES = ("IMAGE", "STRING", "COLOR_LUT")
+    RETURN_NAMES = ("image", "debug", "lut")
     FUNCTION = "run"
     CATEGORY = "PortraitUtils/Analysis"
 
-    def run(self, image, reference, method="wb_highlight+reinhard",
+    @classmethod
+    def IS_CHANGED(cls, profile_path="", **kwargs):
+        # Re-run when the profile file is rewritten; other inputs are tracked by ComfyUI.
+        if not str(profile_path or "").strip():
+            return ""
+        path = resolve_output_path(profile_path, "AutoWBColorMatch profile")
+        try:
+            return f"{path}|{os.path.getmtime(path)}"
+        except OSError:
+            return path
+
+    def run(self, image, reference=None, method="wb_highlight+reinhard",
             percentile=95.0, strength=1.0, clip_gamut=True,
-            force_size=False, target_width=1440, target_height=1080):
+            force_size=False, target_width=1440, target_height=1080,
+            stats_resolution="Full", stats_error_report=False, lab_chunk_mb=LAB_CHUNK_MB,
+            highlight_threshold="histogram", reference_mode="auto", lut_size="off",
+            profile_path="", histogram_bins="1024"):
         with torch.no_grad():
             src = enforce_image_format(image, force_rgb=True)
-            ref = enforce_image_format(reference, force_rgb=True)
+            profile = None
+            if str(profile_path or "").strip():
+                profile = _read_profile(resolve_output_path(profile_path, "AutoWBColorMatch profile"))
+                ref = None
+            elif reference is not None:
+                ref = enforce_image_format(reference, force_rgb=True)
+            elif method in ("reinhard_lab", "lab_l_only", "wb_highlight+reinhard", "histogram_match"):
+                raise ValueError(f"AutoWBColorMatch: method '{method}' needs a reference image or a profile_path.")
+            else:
+                ref = None
+            debug = f"method={method}"
+            exact_threshold = highlight_threshold == "exact"
+
+            lookups = _REF_CACHE_COUNTERS["hits"] + _REF_CACHE_COUNTERS["misses"]
+            resolved = []
+
+            def reference(how, prepare):
+                # Deferred so the white-balance-only methods never touch the reference.
+                def stats(kind):
+                    if profile is not None:
+                        resolved.append("profile")
+                        return _profile_stats(profile, kind, src.device, src.dtype)
+                    measured, mode = _resolve_reference(
+                        _reference_stats(ref, how, prepare, kind, lab_chunk_mb), reference_mode, src.shape[0])
+                    resolved.append(mode)
+                    return measured
+                return stats
+
+            def estimate(img, ref_stats):
+                return _estimate_params(img, ref_stats, method, percentile, lab_chunk_mb,
+                                        exact_threshold, int(histogram_bins))
 
             if force_size:
                 th, tw = target_height, target_width
                 src_small = resize_bhwc(src, th, tw)
-                ref_small = resize_bhwc(ref, th, tw)
+                ref_stats = reference(("force_size", th, tw), lambda r: resize_bhwc(r, th, tw))
+                params = estimate(src_small, ref_stats)
+                del src_small
+                # Gains, the Lab transform and the curves are per-image, so the working
+                # size is only used to measure them; apply at native resolution.
+                matched = _apply_params(src, params, lab_chunk_mb)
+                debug += f" force_size={tw}x{th}"
             else:
-                src_small, ref_small = src, ref
-
-            # 1) white balance / base correction
-            if method in ("wb_grayworld",):
-                base = wb_grayworld(src_small)
-            elif method in ("wb_highlight", "wb_highlight+reinhard"):
-                base = wb_highlight(src_small, percentile=float(percentile))
-            elif method in ("reinhard_lab","lab_l_only"):
-                base = src_small
-            else:
-                base = src_small
-
-            # 2) color match
-            if method == "reinhard_lab":
-                matched = reinhard_match(base, ref_small, l_only=False)
-            elif method == "lab_l_only":
-                matched = reinhard_match(base, ref_small, l_only=True)
-            elif method == "wb_highlight+reinhard":
-                matched = reinhard_match(base, ref_small, l_only=False)
-            else:
-                matched = base
-
-            # If we resized for stats, reapply the transform back to original resolution
-            if force_size and (src.shape[1]!=matched.shape[1] or src.shape[2]!=matched.shape[2]):
-                matched = resize_bhwc(matched, src.shape[1], src.shape[2])
+                src_stats = stats_proxy(src, stats_resolution)
+                ref_stats = reference(("stats", stats_resolution), lambda r: stats_proxy(r, stats_resolution))
+                params = estimate(src_stats, ref_stats)
+                debug += f" stats={stats_resolution} {src_stats.shape[2]}x{src_stats.shape[1]}"
+                del src_stats
+                matched = _apply_params(src, params, lab_chunk_mb)
+            if stats_error_report and (force_size or stats_resolution != "Full"):
+                # Compare with the correction measured on every native pixel.
+                ref_full = reference(("stats", "Full"), lambda r: r)
+                exact = _apply_params(src, estimate(src, ref_full), lab_chunk_mb)
+                debug += " " + describe_proxy_error(matched, exact)
+                del exact
+
+            if resolved and profile is not None:
+                debug += f" reference=profile({profile['images']} images)"
+            elif resolved:
+                debug += f" reference={resolved[0]}({ref.shape[0]})"
+            if _REF_CACHE_COUNTERS["hits"] + _REF_CACHE_COUNTERS["misses"] > lookups:
+                debug += (
+                    f" ref_cache(hits={_REF_CACHE_COUNTERS['hits']} misses={_REF_CACHE_COUNTERS['misses']}"
+                    f" entries={len(_REF_STATS_CACHE)})"
+                )
 
             # 3) blend strength
             out = (1 - strength) * src + strength * matched
             if clip_gamut:
                 out = out.clamp(0,1)
 
-            return (out,)
+            lut = None
+            if lut_size != "off":
+                lut = _bake_lut(params, int(lut_size), strength, clip_gamut, src.shape[0], src.device, lab_chunk_mb)
+                debug += f" lut={lut_size}"
+            return (out, debug, lut)
+
+class BuildColorProfile:
+    """Reduce a directory of reference images to a reusable colour profile JSON."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "reference_dir": ("STRING", {"default": ""}),
+                "profile_path": ("STRING", {
+                    "default": "profiles/house_look.json",
+                    "tooltip": "Where to write the profile. Relative paths are placed under the ComfyUI output directory.",
+                }),
+                "stats_resolution": (list(STATS_RESOLUTIONS), {"default": "1 MP"}),
+                "percentile": ("FLOAT", {"default": 95.0, "min": 80.0, "max": 99.9, "step": 0.1}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("profile_path", "summary")
+    FUNCTION = "build"
+    OUTPUT_NODE = True
+    CATEGORY = "PortraitUtils/Analysis"
+
+    def build(self, reference_dir, profile_path, stats_resolution="1 MP", percentile=95.0):
+        folder = os.path.abspath(os.path.expanduser(str(reference_dir or "").strip()))
+        if not reference_dir or not os.path.isdir(folder):
+            raise ValueError(f"BuildColorProfile: reference_dir not found: {folder}")
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if os.path.splitext(name)[1].lower() in _PROFILE_EXTENSIONS
+        )
+        with torch.no_grad():
+            profile = build_color_profile(paths, stats_resolution, percentile)
+        target = resolve_output_path(profile_path, "BuildColorProfile")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as handle:
+            json.dump(profile, handle, indent=2)
+        mean = ", ".join(f"{v:.2f}" for v in profile["lab_mean"])
+        std = ", ".join(f"{v:.2f}" for v in profile["lab_std"])
+        summary = f"images={profile['images']} lab_mean=({mean}) lab_std=({std})"
+        return (target, summary)
 
 NODE_CLASS_MAPPINGS = {
     "AutoWBColorMatch": AutoWBColorMatch,
+    "BuildColorProfile": BuildColorProfile,
 }
 NODE_DISPLAY_NAME_MAPPINGS = {
     "AutoWBColorMatch": "Auto White-Balance + Color Match",
+    "BuildColorProfile": "Build Color Profile (Reference Set)",
 }
@@ -0,0 +1,206 @@
+"""
+3D colour LUTs: bake a per-pixel colour transform once, replay it by trilinear
+lookup.
+
+A COLOR_LUT is a float32 tensor [B, S, S, S, 3] of output RGB in [0, 1],
+indexed [blue, green, red] (the .cube data order, red varying fastest). B is 1
+for a single look or one LUT per image of the batch it was measured on.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from .image_utils import enforce_image_format, resolve_output_path
+
+LUT_SIZES = ["33", "65"]
+
+
+def _require_lut(lut, node: str) -> None:
+    # AutoWBColorMatch returns None for its lut output when lut_size is "off".
+    if lut is None:
+        raise ValueError(f"{node}: no LUT was baked; set lut_size to 33 or 65 on the node that produces it.")
+
+
+def identity_lut(size: int, device=None, dtype=torch.float32) -> torch.Tensor:
+    """[S, S, S, 3] grid whose entry [b, g, r] is the colour (r, g, b)/(S-1)."""
+    axis = torch.linspace(0.0, 1.0, size, device=device, dtype=dtype)
+    blue, green, red = torch.meshgrid(axis, axis, axis, indexing="ij")
+    return torch.stack([red, green, blue], dim=-1)
+
+
+def apply_lut(image: torch.Tensor, lut: torch.Tensor) -> torch.Tensor:
+    """Map RGB image [B,H,W,3] through lut [1 or B, S, S, S, 3] with trilinear interpolation."""
+    B = image.shape[0]
+    L = lut.shape[0]
+    if L not in (1, B):
+        raise ValueError(f"ApplyColorLUT: {L} LUTs for {B} images; pass 1 or {B}.")
+    volume = lut.to(device=image.device, dtype=image.dtype).permute(0, 4, 1, 2, 3)  # [L,3,D=b,H=g,W=r]
+    if L != B:
+        volume = volume.expand(B, -1, -1, -1, -1)
+    # grid_sample reads (x, y, z) = (W, H, D) = (red, green, blue) in [-1, 1].
+    grid = (image * 2.0 - 1.0).unsqueeze(1)                                          # [B,1,H,W,3]
+    out = F.grid_sample(volume, grid, mode="bilinear", padding_mode="border", align_corners=True)
+    return out[:, :, 0].permute(0, 2, 3, 1).clamp(0.0, 1.0)
+
+
+def write_cube(path: str, lut: torch.Tensor, title: str = "") -> None:
+    """Write one [S, S, S, 3] LUT as an Adobe/Resolve .cube file."""
+    size = lut.shape[0]
+    data = lut.detach().to(device="cpu", dtype=torch.float64).reshape(-1, 3).numpy()
+    with open(path, "w", encoding="utf-8", newline="\n") as handle:
+        if title:
+            handle.write(f'TITLE "{title}"\n')
+        handle.write(f"LUT_3D_SIZE {size}\n")
+        handle.write("DOMAIN_MIN 0.0 0.0 0.0\nDOMAIN_MAX 1.0 1.0 1.0\n")
+        np.savetxt(handle, data, fmt="%.6f")
+
+
+def read_cube(path: str) -> torch.Tensor:
+    """Read a 3D .cube file (0..1 domain) into a [S, S, S, 3] float32 tensor."""
+    size = None
+    rows = []
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            head = line.split()[0].upper()
+            if head == "LUT_3D_SIZE":
+                size = int(line.split()[1])
+            elif head in ("DOMAIN_MIN", "DOMAIN_MAX"):
+                bounds = [float(v) for v in line.split()[1:4]]
+                if bounds != ([0.0] * 3 if head == "DOMAIN_MIN" else [1.0] * 3):
+                    raise ValueError(f"LoadColorLUT: only the 0..1 domain is supported ({path}).")
+            elif head == "LUT_3D_INPUT_RANGE":
+                if [float(v) for v in line.split()[1:3]] != [0.0, 1.0]:
+                    raise ValueError(f"LoadColorLUT: only the 0..1 domain is supported ({path}).")
+            elif head.startswith("LUT_1D"):
+                raise ValueError(f"LoadColorLUT: 1D LUTs are not supported ({path}).")
+            elif head == "TITLE":
+                continue
+            else:
+                rows.append(line)
+    if size is None:
+        raise ValueError(f"LoadColorLUT: missing LUT_3D_SIZE in {path}.")
+    data = np.array([row.split()[:3] for row in rows], dtype=np.float32)
+    if data.shape[0] != size ** 3:
+        raise ValueError(f"LoadColorLUT: expected {size ** 3} entries, found {data.shape[0]} in {path}.")
+    return torch.from_numpy(data).view(size, size, size, 3)
+
+
+def _batch_paths(path: str, count: int):
+    if count == 1:
+        return [path]
+    stem, ext = os.path.splitext(path)
+    return [f"{stem}_{i:03d}{ext}" for i in range(count)]
+
+
+class ApplyColorLUT:
+    """Replay a baked COLOR_LUT on any image batch (alpha is passed through)."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "lut": ("COLOR_LUT",),
+                "strength": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0, "step": 0.01}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    RETURN_NAMES = ("image",)
+    FUNCTION = "apply"
+    CATEGORY = "PortraitUtils/Analysis"
+
+    def apply(self, image, lut, strength=1.0):
+        with torch.no_grad():
+            image = enforce_image_format(image)
+            if image.shape[-1] == 1:
+                image = image.repeat(1, 1, 1, 3)
+            rgb = image[..., :3]
+            _require_lut(lut, "ApplyColorLUT")
+            out = apply_lut(rgb, lut)
+            if strength < 1.0:
+                out = torch.lerp(rgb, out, strength)
+            if image.shape[-1] == 4:
+                out = torch.cat([out, image[..., 3:4]], dim=-1)
+            return (out,)
+
+
+class SaveColorLUT:
+    """Write a COLOR_LUT to .cube (one file per LUT, suffixed _000, _001… for batches)."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "lut": ("COLOR_LUT",),
+                "path": ("STRING", {"default": "luts/color_match.cube",
+                                    "tooltip": "Relative paths are placed under the ComfyUI output directory."}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("path",)
+    FUNCTION = "save"
+    OUTPUT_NODE = True
+    CATEGORY = "PortraitUtils/Analysis"
+
+    def save(self, lut, path):
+        _require_lut(lut, "SaveColorLUT")
+        target = resolve_output_path(path, "Color LUT")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        paths = _batch_paths(target, lut.shape[0])
+        for i, p in enumerate(paths):
+            write_cube(p, lut[i], title=os.path.splitext(os.path.basename(p))[0])
+        return ("\n".join(paths),)
+
+
+class LoadColorLUT:
+    """Load a .cube file as a single-image COLOR_LUT."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "path": ("STRING", {"default": "luts/color_match.cube",
+                                    "tooltip": "Relative paths are read from the ComfyUI output directory."}),
+            }
+        }
+
+    RETURN_TYPES = ("COLOR_LUT",)
+    RETURN_NAMES = ("lut",)
+    FUNCTION = "load"
+    CATEGORY = "PortraitUtils/Analysis"
+
+    @classmethod
+    def IS_CHANGED(cls, path):
+        target = resolve_output_path(path, "Color LUT")
+        try:
+            return f"{target}|{os.path.getmtime(target)}"
+        except OSError:
+            return target
+
+    def load(self, path):
+        target = resolve_output_path(path, "Color LUT")
+        if not os.path.isfile(target):
+            raise ValueError(f"LoadColorLUT: file not found: {target}")
+        return (read_cube(target).unsqueeze(0),)
+
+
+NODE_CLASS_MAPPINGS = {
+    "ApplyColorLUT": ApplyColorLUT,
+    "SaveColorLUT": SaveColorLUT,
+    "LoadColorLUT": LoadColorLUT,
+}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "ApplyColorLUT": "Apply Color LUT",
+    "SaveColorLUT": "Save Color LUT (.cube)",
+    "LoadColorLUT": "Load Color LUT (.cube)",
+}
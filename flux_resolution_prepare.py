@@ -8,13 +8,17 @@ then resizes the crop to the nearest Flux-compatible resolution.
 
 from __future__ import annotations
 
+import json
 import math
+import os
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 import torch
 import torch.nn.functional as F
-from .image_utils import enforce_image_format
+from PIL import Image
+from .image_utils import enforce_image_format, resolve_output_path
 
 @dataclass(frozen=True)
 class _TargetResolution:
@@ -87,18 +91,18 @@ _TARGET_RESOLUTIONS: Tuple[_TargetResolution, ...] = _build_target_resolutions()
 
 
 
-def _resize_sample(sample: torch.Tensor, height: int, width: int) -> torch.Tensor:
-    if sample.shape[0] == height and sample.shape[1] == width:
-        return sample
-    # sample: [H, W, C]
-    tensor = sample.permute(2, 0, 1).unsqueeze(0)
+def _resize_batch(batch: torch.Tensor, height: int, width: int) -> torch.Tensor:
+    if batch.shape[1] == height and batch.shape[2] == width:
+        return batch
+    # batch: [B, H, W, C] — one interpolate call for every image
+    tensor = batch.permute(0, 3, 1, 2)
     tensor = F.interpolate(
         tensor,
         size=(height, width),
         mode="bicubic",
         align_corners=False,
     )
-    return tensor.squeeze(0).permute(1, 2, 0)
+    return tensor.permute(0, 2, 3, 1)
 
 
 def _compute_crop_dims(width: int, height: int, ratio: float) -> Tuple[int, int]:
@@ -118,19 +122,7 @@ def _compute_crop_dims(width: int, height: int, ratio: float) -> Tuple[int, int]
     return target_width, target_height
 
 
-def _center_crop(sample: torch.Tensor, width: int, height: int) -> Tuple[torch.Tensor, int, int]:
-    src_h, src_w = sample.shape[:2]
-    left = max(0, (src_w - width) // 2)
-    top = max(0, (src_h - height) // 2)
-    right = min(src_w, left + width)
-    bottom = min(src_h, top + height)
-    # Re-align if rounding caused overflow.
-    left = max(0, right - width)
-    top = max(0, bottom - height)
-    cropped = sample[top:bottom, left:right, :]
-    return cropped, left, top
-
-
+@lru_cache(maxsize=4096)
 def _select_target_combo(width: int, height: int):
     if width <= 0 or height <= 0:
         raise ValueError("Invalid crop dimensions encountered")
@@ -169,20 +161,140 @@ def _select_target_combo(width: int, height: int):
     return best
 
 
-def _maybe_pre_upscale(sample: torch.Tensor, min_megapixels: float) -> Tuple[torch.Tensor, float]:
-    height, width = sample.shape[:2]
+def _pre_upscale_dims(height: int, width: int, min_megapixels: float) -> Tuple[int, int]:
     area = height * width
     min_pixels = max(0.0, min_megapixels) * 1_000_000.0
     if min_pixels <= 0.0 or area >= min_pixels:
-        return sample, 1.0
+        return height, width
 
     scale = math.sqrt(min_pixels / max(area, 1.0))
-    new_height = max(1, int(round(height * scale)))
-    new_width = max(1, int(round(width * scale)))
-    if new_height == height and new_width == width:
-        return sample, 1.0
-    upscaled = _resize_sample(sample, new_height, new_width)
-    return upscaled, new_width / max(width, 1.0)
+    return max(1, int(round(height * scale))), max(1, int(round(width * scale)))
+
+
+@dataclass(frozen=True)
+class _PreparePlan:
+    """Everything FluxResolutionPrepare does to one source size.
+
+    Crop coordinates are in the pre-upscaled frame (equal to the source frame
+    when no pre-upscale happens); `box` is the same crop in source pixels,
+    which is what gets resampled.
+    """
+
+    source_height: int
+    source_width: int
+    pre_height: int
+    pre_width: int
+    pre_scale: float
+    crop_x: int
+    crop_y: int
+    crop_width: int
+    crop_height: int
+    target: _TargetResolution
+    area_loss: float
+
+    @property
+    def box(self) -> Tuple[float, float, float, float]:
+        sx = self.pre_width / self.source_width
+        sy = self.pre_height / self.source_height
+        return (self.crop_x / sx, self.crop_y / sy, self.crop_width / sx, self.crop_height / sy)
+
+
+def _plan_prepare(
+    height: int,
+    width: int,
+    min_megapixels: float,
+    enable_pre_upscale: bool,
+    crop_width=-1,
+    crop_height=-1,
+    crop_x=0,
+    crop_y=0,
+) -> _PreparePlan:
+    pre_height, pre_width = height, width
+    if enable_pre_upscale:
+        pre_height, pre_width = _pre_upscale_dims(height, width, min_megapixels)
+    pre_scale = pre_width / max(width, 1.0) if (pre_height, pre_width) != (height, width) else 1.0
+    scale_x = pre_width / max(1, width)
+    scale_y = pre_height / max(1, height)
+
+    # Optional manual crop, given in source pixels.
+    wx, wy, ww, wh = 0, 0, pre_width, pre_height
+    if isinstance(crop_width, (int, float)) and isinstance(crop_height, (int, float)):
+        if crop_width > 0 and crop_height > 0:
+            sx = int(round(max(0.0, crop_x) * scale_x))
+            sy = int(round(max(0.0, crop_y) * scale_y))
+            sw = int(round(crop_width * scale_x))
+            sh = int(round(crop_height * scale_y))
+            if sw > 0 and sh > 0:
+                sx = max(0, min(sx, pre_width - 1))
+                sy = max(0, min(sy, pre_height - 1))
+                sw = max(1, min(sw, pre_width - sx))
+                sh = max(1, min(sh, pre_height - sy))
+                wx, wy, ww, wh = sx, sy, sw, sh
+
+    target, crop_w, crop_h, _ = _select_target_combo(ww, wh)
+    # Same placement as _center_crop, inside the working region.
+    left = max(0, (ww - crop_w) // 2)
+    top = max(0, (wh - crop_h) // 2)
+    left = max(0, min(ww, left + crop_w) - crop_w)
+    top = max(0, min(wh, top + crop_h) - crop_h)
+
+    area_loss = max(0.0, 1.0 - (crop_w * crop_h) / max(float(pre_width * pre_height), 1.0))
+    return _PreparePlan(
+        height, width, pre_height, pre_width, pre_scale,
+        wx + left, wy + top, crop_w, crop_h, target, area_loss,
+    )
+
+
+def _plan_entry(plan: _PreparePlan) -> Dict[str, object]:
+    """Manifest fields shared by the batch node and the planner."""
+    return {
+        "bucket": plan.target.label,
+        "ratio": plan.target.ratio_label,
+        "source_size": [plan.source_width, plan.source_height],
+        # Crop box [x, y, width, height] in source pixels.
+        "crop": [round(v, 2) for v in plan.box],
+        "area_loss_percent": round(plan.area_loss * 100.0, 3),
+        "pre_scale_factor": plan.pre_scale,
+    }
+
+
+def _resample_box(batch: torch.Tensor, box: Tuple[float, float, float, float], height: int, width: int) -> torch.Tensor:
+    """Bicubic resample of a fractional source box [x, y, w, h] of [B, H, W, C] to height x width.
+
+    Output pixel centres map into the box exactly as F.interpolate maps them
+    into a crop of the same size, and border taps are clamped the same way.
+    """
+    B, src_h, src_w, _ = batch.shape
+    x0, y0, bw, bh = box
+    xs = x0 + (torch.arange(width, dtype=torch.float64) + 0.5) * (bw / width)
+    ys = y0 + (torch.arange(height, dtype=torch.float64) + 0.5) * (bh / height)
+    # align_corners=False normalisation: pixel edge 0 -> -1, edge W -> +1.
+    gx = (xs * (2.0 / src_w) - 1.0).view(1, width).expand(height, width)
+    gy = (ys * (2.0 / src_h) - 1.0).view(height, 1).expand(height, width)
+    grid = torch.stack([gx, gy], dim=-1).to(device=batch.device, dtype=batch.dtype)
+    out = F.grid_sample(
+        batch.permute(0, 3, 1, 2),
+        grid.unsqueeze(0).expand(B, -1, -1, -1),
+        mode="bicubic",
+        padding_mode="border",
+        align_corners=False,
+    )
+    return out.permute(0, 2, 3, 1)
+
+
+def _execute_plan(batch: torch.Tensor, plan: _PreparePlan) -> torch.Tensor:
+    """Apply a plan to [B, H, W, C] images that all share its source size.
+
+    The crop box is mapped back to source pixels and resampled once, straight
+    to the target size, so a pre-upscale never materialises the enlarged image.
+    """
+    x, y, w, h = plan.box
+    if all(float(v).is_integer() for v in (x, y, w, h)):
+        x, y, w, h = int(x), int(y), int(w), int(h)
+        out = _resize_batch(batch[:, y:y + h, x:x + w, :], plan.target.height, plan.target.width)
+    else:
+        out = _resample_box(batch, plan.box, plan.target.height, plan.target.width)
+    return out.clamp(0.0, 1.0)
 
 
 class FluxResolutionPrepare:
@@ -219,61 +331,203 @@ class FluxResolutionPrepare:
     ):
         with torch.no_grad():
             tensor = enforce_image_format(image)
-            if tensor.shape[0] != 1:
-                raise ValueError("FluxResolutionPrepare expects an unbatched IMAGE tensor (B=1)")
-
-            sample = tensor[0]
-            orig_height, orig_width = sample.shape[:2]
-            pre_scale = 1.0
-            if enable_pre_upscale:
-                sample, pre_scale = _maybe_pre_upscale(sample, min_megapixels)
-
-            sample_height, sample_width = sample.shape[:2]
-            scale_x = sample_width / max(1, orig_width)
-            scale_y = sample_height / max(1, orig_height)
-
-            orig_area = float(sample_height * sample_width)
-
-            work = sample
-            if isinstance(crop_width, (int, float)) and isinstance(crop_height, (int, float)):
-                if crop_width > 0 and crop_height > 0:
-                    sx = int(round(max(0.0, crop_x) * scale_x))
-                    sy = int(round(max(0.0, crop_y) * scale_y))
-                    sw = int(round(crop_width * scale_x))
-                    sh = int(round(crop_height * scale_y))
-                    if sw > 0 and sh > 0:
-                        sx = max(0, min(sx, sample_width - 1))
-                        sy = max(0, min(sy, sample_height - 1))
-                        sw = max(1, min(sw, sample_width - sx))
-                        sh = max(1, min(sh, sample_height - sy))
-                        work = sample[sy : sy + sh, sx : sx + sw, :]
-
-            work_height, work_width = work.shape[:2]
-            target, crop_w, crop_h, _ = _select_target_combo(work_width, work_height)
-            cropped, _, _ = _center_crop(work, crop_w, crop_h)
-            del work
-
-            resized = _resize_sample(cropped, target.height, target.width).clamp(0.0, 1.0)
-            del cropped
-            output = resized.unsqueeze(0)
-
-            final_area = float(crop_w * crop_h)
-            total_area_loss = max(0.0, 1.0 - (final_area / max(orig_area, 1.0)))
-            area_loss_percent = float(total_area_loss * 100.0)
+            # A batch shares one size, so one plan (and one resize per step) covers it.
+            plan = _plan_prepare(
+                tensor.shape[1], tensor.shape[2], min_megapixels, enable_pre_upscale,
+                crop_width, crop_height, crop_x, crop_y,
+            )
+            output = _execute_plan(tensor, plan)
             return (
                 output,
-                target.ratio_label,
-                int(target.width),
-                int(target.height),
-                area_loss_percent,
-                float(pre_scale),
+                plan.target.ratio_label,
+                int(plan.target.width),
+                int(plan.target.height),
+                float(plan.area_loss * 100.0),
+                float(plan.pre_scale),
             )
 
 
+class FluxResolutionPrepareBatch:
+    """Prepare a list of differently sized images, grouped by Flux bucket.
+
+    Images with the same source size share a plan and are resized together;
+    outputs come back as one IMAGE batch per target resolution, plus a JSON
+    manifest describing where every input went.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE",),
+                "min_megapixels": ("FLOAT", {"default": 0.95, "min": 0.1, "max": 64.0, "step": 0.05}),
+                "enable_pre_upscale": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    INPUT_IS_LIST = True
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING")
+    RETURN_NAMES = ("images", "bucket", "manifest")
+    OUTPUT_IS_LIST = (True, True, False)
+    FUNCTION = "apply"
+    CATEGORY = "PortraitUtils/Transform"
+
+    def apply(self, images, min_megapixels=(0.95,), enable_pre_upscale=(True,)):
+        min_megapixels = float(min_megapixels[0])
+        enable_pre_upscale = bool(enable_pre_upscale[0])
+        with torch.no_grad():
+            # Group every input image by source size; each group is one plan.
+            groups: Dict[Tuple[int, int], List[Tuple[int, torch.Tensor]]] = {}
+            index = 0
+            for item in images:
+                tensor = enforce_image_format(item)
+                for b in range(tensor.shape[0]):
+                    groups.setdefault((tensor.shape[1], tensor.shape[2]), []).append((index, tensor[b]))
+                    index += 1
+
+            buckets: Dict[str, List[torch.Tensor]] = {}
+            entries = [None] * index
+            for (height, width), members in groups.items():
+                plan = _plan_prepare(height, width, min_megapixels, enable_pre_upscale)
+                label = plan.target.label
+                outputs = buckets.setdefault(label, [])
+                offset = sum(t.shape[0] for t in outputs)
+                outputs.append(_execute_plan(torch.stack([t for _, t in members]), plan))
+                for position, (i, _) in enumerate(members):
+                    entries[i] = {"index": i, "bucket_index": offset + position, **_plan_entry(plan)}
+                del members
+
+            labels = list(buckets)
+            batches = [torch.cat(buckets[label], dim=0) for label in labels]
+            manifest = json.dumps({"images": entries, "buckets": {l: b.shape[0] for l, b in zip(labels, batches)}}, indent=2)
+            return (batches, labels, manifest)
+
+
+_PLANNER_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".webp"}
+# EXIF orientations that rotate by 90 degrees, i.e. swap width and height.
+_TRANSPOSING_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _header_orientation(img) -> int:
+    """
+    EXIF orientation from metadata Pillow parsed while opening the file:
+    info["exif"] (JPEG APP1, WebP EXIF, PNG eXIf before the image data) or the
+    TIFF IFD. Image.getexif() is avoided because for PNG without an early eXIf
+    chunk it loads (decodes) the whole image looking for one.
+
+    Newer Pillow already reports TIFF size transposed for orientations 5-8; in
+    that case 1 is returned so the caller does not swap twice.
+    """
+    raw = img.info.get("exif")
+    if raw:
+        exif = Image.Exif()
+        exif.load(raw)
+        return exif.get(0x0112, 1)
+    tags = getattr(img, "tag_v2", None)
+    if tags is not None:
+        stored = (tags.get(256), tags.get(257))
+        if tuple(img.size) != stored:
+            return 1
+        return tags.get(0x0112, 1)
+    return 1
+
+
+def _header_size(path: str) -> Tuple[int, int]:
+    """(width, height) as displayed, from the file header only (no pixel decode)."""
+    with Image.open(path) as img:
+        width, height = img.size
+        try:
+            orientation = _header_orientation(img)
+        except Exception:
+            orientation = 1
+    if orientation in _TRANSPOSING_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+
+class FluxBucketPlanner:
+    """Plan FluxResolutionPrepare over a whole directory without decoding pixels."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "directory": ("STRING", {"default": ""}),
+                "manifest_path": ("STRING", {
+                    "default": "flux_plans/manifest.json",
+                    "tooltip": "Where to write the JSON manifest. Relative paths are placed under the ComfyUI output directory.",
+                }),
+                "min_megapixels": ("FLOAT", {"default": 0.95, "min": 0.1, "max": 64.0, "step": 0.05}),
+                "enable_pre_upscale": ("BOOLEAN", {"default": True}),
+                "recursive": ("BOOLEAN", {"default": False}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("manifest_path", "summary")
+    FUNCTION = "plan"
+    OUTPUT_NODE = True
+    CATEGORY = "PortraitUtils/Transform"
+
+    def plan(self, directory, manifest_path, min_megapixels=0.95, enable_pre_upscale=True, recursive=False):
+        folder = os.path.abspath(os.path.expanduser(str(directory or "").strip()))
+        if not directory or not os.path.isdir(folder):
+            raise ValueError(f"FluxBucketPlanner: directory not found: {folder}")
+
+        paths: List[str] = []
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            paths.extend(
+                os.path.join(root, name) for name in sorted(files)
+                if os.path.splitext(name)[1].lower() in _PLANNER_EXTENSIONS
+            )
+            if not recursive:
+                break
+
+        # Datasets repeat a handful of sizes, so plan each size once.
+        plans: Dict[Tuple[int, int], _PreparePlan] = {}
+        images: List[Dict[str, object]] = []
+        errors: List[Dict[str, str]] = []
+        buckets: Dict[str, int] = {}
+        for path in paths:
+            try:
+                width, height = _header_size(path)
+            except Exception as exc:  # unreadable or truncated header
+                errors.append({"path": path, "error": str(exc)})
+                continue
+            plan = plans.get((height, width))
+            if plan is None:
+                plan = plans[(height, width)] = _plan_prepare(height, width, min_megapixels, enable_pre_upscale)
+            images.append({"path": path, **_plan_entry(plan)})
+            buckets[plan.target.label] = buckets.get(plan.target.label, 0) + 1
+
+        target = resolve_output_path(manifest_path, "FluxBucketPlanner")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        manifest = {
+            "directory": folder,
+            "min_megapixels": float(min_megapixels),
+            "enable_pre_upscale": bool(enable_pre_upscale),
+            "buckets": dict(sorted(buckets.items(), key=lambda kv: -kv[1])),
+            "images": images,
+            "errors": errors,
+        }
+        with open(target, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2)
+
+        mean_loss = sum(e["area_loss_percent"] for e in images) / max(len(images), 1)
+        lines = [f"images={len(images)} sizes={len(plans)} errors={len(errors)} mean_area_loss={mean_loss:.2f}%"]
+        lines += [f"{label}: {count}" for label, count in manifest["buckets"].items()]
+        return (target, "\n".join(lines))
+
+
 NODE_CLASS_MAPPINGS = {
     "FluxResolutionPrepare": FluxResolutionPrepare,
+    "FluxResolutionPrepareBatch": FluxResolutionPrepareBatch,
+    "FluxBucketPlanner": FluxBucketPlanner,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "FluxResolutionPrepare": "Flux Resolution Prepare",
+    "FluxResolutionPrepareBatch": "Flux Resolution Prepare (Bucketed Batch)",
+    "FluxBucketPlanner": "Flux Bucket Planner (Headers Only)",
 }
@@ -1,4 +1,8 @@
+import os
+from typing import Optional
+
 import torch
+import torch.nn.functional as F
 
 def enforce_image_format(image, force_rgb: bool = False) -> torch.Tensor:
     """
@@ -23,3 +27,174 @@ def enforce_image_format(image, force_rgb: bool = False) -> torch.Tensor:
             t = t[..., :3]
             
     return t.clamp(0.0, 1.0)
+
+
+# Upper bound on elements indexed per bincount call; keeps the index buffer
+# of batched_histogram around 64 MB regardless of batch size.
+_HIST_CHUNK_ELEMS = 1 << 24
+
+
+def batched_histogram(x: torch.Tensor, bins: int = 256) -> torch.Tensor:
+    """
+    Histogram every (image, channel) plane of x in one device pass.
+
+    x: [B, N, C] with values in [0.0, 1.0] — result: int64 counts [B, C, bins].
+    Bins are equal-width over [0, 1] with 1.0 falling into the last bin, matching
+    torch.histc(min=0, max=1). Work is chunked along N only, so there is no
+    per-image or per-channel Python loop and no host sync.
+    """
+    B, N, C = x.shape
+    # int32 bin indices halve the index traffic; B*C*bins is far below 2**31.
+    offsets = (torch.arange(B * C, device=x.device, dtype=torch.int32) * bins).view(B, 1, C)
+    counts = torch.zeros(B * C * bins, device=x.device, dtype=torch.int64)
+    step = max(1, _HIST_CHUNK_ELEMS // max(1, B * C))
+    for start in range(0, N, step):
+        chunk = x[:, start:start + step, :]
+        idx = chunk.float().clamp(0.0, 1.0).mul_(bins).to(torch.int32).clamp_(max=bins - 1)
+        idx += offsets
+        counts += torch.bincount(idx.view(-1), minlength=B * C * bins)
+    return counts.view(B, C, bins)
+
+
+# Digit widths (high to low) used by exact_quantiles to radix-select over the
+# 32-bit float keys; 12 + 10 + 10 keeps each pass's count table small.
+_RADIX_PASSES = ((20, 12), (10, 10), (0, 10))
+_INT32_MIN = -(1 << 31)
+_INT32_MAX = (1 << 31) - 1
+
+
+def _monotone_bits(x: torch.Tensor) -> torch.Tensor:
+    """int32 view of float32 x whose signed integer order matches the float order."""
+    bits = x.float().contiguous().view(torch.int32)
+    return bits ^ ((bits >> 31) & 0x7FFFFFFF)
+
+
+def _monotone_bits_to_float(keys: torch.Tensor) -> torch.Tensor:
+    keys = keys.to(torch.int32)
+    return (keys ^ ((keys >> 31) & 0x7FFFFFFF)).view(torch.float32)
+
+
+def exact_quantiles(x: torch.Tensor, qs, valid: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Exact per-(image, channel) quantiles without sorting.
+
+    x: [B, N, C]; qs: sequence of quantiles in [0, 1] — result: float32 [Q, B, C].
+    valid: optional bool mask [B, N, 1] or [B, N, C]; only True entries are
+    ranked, each image/channel against its own count (NaN where it has none).
+    Matches torch.quantile's default linear interpolation, but finds the lower
+    order statistic by radix refinement over the float bit patterns (three O(N)
+    histogram passes instead of an O(N log N) sort) and its successor with one
+    masked min, so there is no input-size limit and no per-image loop.
+    """
+    B, N, C = x.shape
+    device = x.device
+    Q = len(qs)
+    q = torch.tensor([float(v) for v in qs], device=device, dtype=torch.float64)
+    if valid is None:
+        count = torch.full((B, C, 1), N, device=device, dtype=torch.int64)
+    else:
+        count = valid.expand(B, N, C).sum(dim=1).unsqueeze(-1)
+    pos = q.view(1, 1, Q) * (count - 1).clamp(min=0).double()
+    rank = pos.floor()
+    frac = (pos - rank).to(torch.float32)
+    # [B, C, Q]: rank still to find inside the current bucket, and the key prefix so far.
+    rem = rank.to(torch.int64)
+    prefix = torch.zeros(B, C, Q, device=device, dtype=torch.int64)
+    step = max(1, (1 << 22) // max(1, B * C * Q))
+
+    for shift, width in _RADIX_PASSES:
+        nb = 1 << width
+        top = shift + width
+        base = (torch.arange(B * C * Q, device=device, dtype=torch.int64) * nb).view(B, 1, C, Q)
+        dump = B * C * Q * nb
+        counts = torch.zeros(dump + 1, device=device, dtype=torch.int64)
+        for start in range(0, N, step):
+            u = (_monotone_bits(x[:, start:start + step, :]) ^ _INT32_MIN).unsqueeze(-1)
+            idx = base + ((u >> shift) & (nb - 1))                          # [B, n, C, Q]
+            if top < 32:
+                match = ((u >> top) & ((1 << (32 - top)) - 1)) == prefix.unsqueeze(1)
+                idx = torch.where(match, idx, dump)
+            if valid is not None:
+                idx = torch.where(valid[:, start:start + step, :].unsqueeze(-1), idx, dump)
+            counts += torch.bincount(idx.view(-1), minlength=dump + 1)
+        counts = counts[:dump].view(B * C * Q, nb)
+        cdf = torch.cumsum(counts, dim=-1)
+        flat_rem = rem.view(-1, 1)
+        digit = torch.searchsorted(cdf, flat_rem, right=True).clamp_(max=nb - 1)
+        ties = counts.gather(1, digit)
+        rem = (flat_rem - (cdf.gather(1, digit) - ties)).view(B, C, Q)
+        prefix = (prefix << width) | digit.view(B, C, Q)
+
+    lo_key = prefix + _INT32_MIN                                             # [B, C, Q]
+    lo_val = _monotone_bits_to_float(lo_key)
+    # The upper neighbour is the same value unless the lower one is the last
+    # copy of its key; only then scan once more for the smallest larger key.
+    last_copy = (rem + 1) >= ties.view(B, C, Q)
+    needs_next = last_copy & (frac > 0)
+    hi_val = lo_val
+    if bool(needs_next.any()):
+        nxt = torch.full((B, C, Q), _INT32_MAX, device=device, dtype=torch.int32)
+        lo_key32 = lo_key.to(torch.int32).unsqueeze(1)
+        for start in range(0, N, step):
+            s = _monotone_bits(x[:, start:start + step, :]).unsqueeze(-1)
+            keep = s > lo_key32
+            if valid is not None:
+                keep &= valid[:, start:start + step, :].unsqueeze(-1)
+            cand = torch.where(keep, s, _INT32_MAX)
+            nxt = torch.minimum(nxt, cand.amin(dim=1))
+        hi_val = torch.where(needs_next, _monotone_bits_to_float(nxt), lo_val)
+
+    out = lo_val + (hi_val - lo_val) * frac
+    if valid is not None:
+        out = out.masked_fill(count == 0, float("nan"))
+    return out.permute(2, 0, 1)
+
+
+def resolve_output_path(path_value, label: str) -> str:
+    """Absolute path for a user-supplied file path; relative paths live under the ComfyUI output directory."""
+    path = os.path.expanduser(str(path_value or "").strip())
+    if not path:
+        raise ValueError(f"{label}: a file path is required.")
+    if not os.path.isabs(path):
+        import folder_paths  # only available inside ComfyUI
+
+        path = os.path.join(folder_paths.get_output_directory(), path)
+    return os.path.abspath(path)
+
+
+# Proxy sizes offered by the nodes' `stats_resolution` option, in megapixels
+# (None keeps the full-resolution image).
+STATS_RESOLUTIONS = {
+    "Full": None,
+    "4 MP": 4.0,
+    "2 MP": 2.0,
+    "1 MP": 1.0,
+    "0.5 MP": 0.5,
+}
+
+
+def stats_proxy(x: torch.Tensor, resolution: str) -> torch.Tensor:
+    """
+    Area-downsample x ([B, H, W, C]) to at most the megapixels named by
+    `resolution` (a STATS_RESOLUTIONS key) for computing global statistics.
+    Returns x itself when it is already small enough or for "Full".
+    """
+    megapixels = STATS_RESOLUTIONS.get(resolution)
+    H, W = x.shape[1], x.shape[2]
+    if megapixels is None or H * W <= megapixels * 1_000_000:
+        return x
+    scale = (megapixels * 1_000_000 / float(H * W)) ** 0.5
+    h = max(1, int(H * scale))
+    w = max(1, int(W * scale))
+    proxy = F.interpolate(x.permute(0, 3, 1, 2), size=(h, w), mode="area")
+    return proxy.permute(0, 2, 3, 1).contiguous()
+
+
+def describe_proxy_error(approx: torch.Tensor, exact: torch.Tensor) -> str:
+    """One-line summary of |approx - exact| in 8-bit levels, overall and per image."""
+    diff = (approx - exact).abs() * 255.0
+    per_image = diff.flatten(1).amax(dim=1).tolist()
+    return (
+        f"vs exact: mean={float(diff.mean()):.3f}/255 max={float(diff.max()):.2f}/255 "
+        f"per-image max=[{', '.join(f'{v:.2f}' for v in per_image)}]"
+    )
@@ -1,3 +1,4 @@
+import numpy as np
 import torch
 import torch.nn.functional as F
 
@@ -7,63 +8,209 @@ def _rgb_to_luma(rgb: torch.Tensor) -> torch.Tensor:
     weights = torch.tensor([0.2126, 0.7152, 0.0722], device=rgb.device, dtype=rgb.dtype)
     return torch.tensordot(rgb, weights, dims=([-1], [0]))
 
-def _scan_edge(lines: torch.Tensor, fuzz_tol: float, edge_unif: float) -> int:
-    limit = lines.shape[0] // 2
-    trim = 0
-    N = 24  # Maximum gap width to forgive over graphical blocks
-    
-    prev_base = None
-    C = lines.shape[2]
-    
-    while trim < limit:
-        current_line = lines[trim]
-        base_color = current_line.median(dim=0).values
-        
-        mad = (current_line - base_color.view(1, C)).abs().mean(dim=-1).median()
-        thresh = min(0.15, float(fuzz_tol) + float(mad.item()) * 2.5)
-        
-        if prev_base is not None:
-            color_jump = (base_color - prev_base).abs().mean().item()
-            if color_jump < max(0.10, thresh * 2.0):
-                break
-                
-        self_dist = (current_line - base_color.view(1, C)).abs().mean(dim=-1)
-        self_uf = (self_dist <= thresh).float().mean()
-        
-        # Ensures respect for bounding edge parameter immediately rather than hard-locking
-        if self_uf < float(edge_unif):
-            break
-            
-        remaining = lines[trim:limit]
-        dist = (remaining - base_color.view(1, 1, C)).abs().mean(dim=-1)
-        uf = (dist <= thresh).float().mean(dim=1)
-        matches = (uf >= float(edge_unif)).float()
-        
-        L = matches.shape[0]
-        if L < N:
-            # Revert to linear contiguous scan on margins too thin to gap-jump
-            run = int(matches.cummin(dim=0).values.sum().item())
-        else:
-            is_zero = (matches == 0.0).float()
-            kernel = torch.ones(N, device=matches.device)
-            # Find all chunks exhibiting an N-pixel solid failure wall
-            zero_blocks = F.conv1d(is_zero.view(1, 1, -1), kernel.view(1, 1, N)).view(-1)
-            
+# Initial lines compared per scan when measuring a run; doubles every round.
+_MATCH_CHUNK = 256
+# Maximum gap width to forgive over graphical blocks
+_GAP_N = 24
+# Upper bound on float elements gathered per scan round (all active scans of
+# the batch together), ~128 MB of float32 lines.
+_SCAN_BUDGET_ELEMS = 1 << 25
+
+# Scan kinds, in the order they are stacked and reported.
+_TOP, _BOTTOM, _LEFT, _RIGHT = range(4)
+
+
+def _first_wall(matches: np.ndarray) -> int:
+    """Start of the first _GAP_N-wide wall of non-matching lines, or -1."""
+    if matches.shape[0] < _GAP_N:
+        return -1
+    zeros = np.concatenate([[0], np.cumsum(~matches)])
+    walls = np.flatnonzero(zeros[_GAP_N:] - zeros[:-_GAP_N] == _GAP_N)
+    return int(walls[0]) if walls.size else -1
+
+
+class _EdgeScans:
+    """
+    Geometry of the 4 * B inward edge scans of a batch (top, bottom, left,
+    right of each image, stacked kind-major). Lines of any set of scans are
+    gathered in one indexing op; column lines of images with a shorter ROI are
+    NaN-padded so every line has the same length.
+    """
+
+    def __init__(self, img: torch.Tensor, roi_h: np.ndarray):
+        B, H, W, C = img.shape
+        self.img = img
+        self.channels = C
+        kind = np.repeat(np.arange(4), B)
+        self.image = np.tile(np.arange(B), 4)
+        h = roi_h[self.image]
+        self.rows = kind < _LEFT                                   # scans whose lines are image rows
+        self.limit = np.where(self.rows, h // 2, W // 2)
+        self.origin = np.select([kind == _BOTTOM, kind == _RIGHT], [h - 1, W - 1], 0)
+        self.step = np.where((kind == _BOTTOM) | (kind == _RIGHT), -1, 1)
+        self.valid = np.where(self.rows, W, h)                     # pixels per line
+        self.length = max(H, W)
+        self.roi_h = torch.as_tensor(roi_h, device=img.device)
+
+    def gather(self, sel: np.ndarray, offs: np.ndarray):
+        """Lines offs [len(sel), n] (inward from each scan's edge) as [len(sel), n, P, C], plus valid counts."""
+        B, H, W, C = self.img.shape
+        dev = self.img.device
+        idx = self.origin[sel, None] + self.step[sel, None] * offs
+        parts = []
+        rows = self.rows[sel]
+        if rows.any():
+            b = torch.as_tensor(self.image[sel][rows], device=dev).view(-1, 1)
+            y = torch.as_tensor(np.clip(idx[rows], 0, H - 1), device=dev)
+            part = self.img[b, y]                                           # [Sr, n, W, C]
+            if self.length > W:
+                part = F.pad(part, (0, 0, 0, self.length - W), value=float("nan"))
+            parts.append(part)
+        if (~rows).any():
+            b = torch.as_tensor(self.image[sel][~rows], device=dev).view(-1, 1)
+            x = torch.as_tensor(np.clip(idx[~rows], 0, W - 1), device=dev)
+            part = self.img[b, :, x]                                        # [Sc, n, H, C]
+            if (self.valid[sel][~rows] < H).any():
+                inside = torch.arange(H, device=dev).view(1, 1, H, 1) < self.roi_h[b].view(-1, 1, 1, 1)
+                part = part.masked_fill(~inside, float("nan"))
+            if self.length > H:
+                part = F.pad(part, (0, 0, 0, self.length - H), value=float("nan"))
+            parts.append(part)
+        # Row scans precede column scans in the stacked order, so sel stays aligned.
+        lines = torch.cat(parts) if len(parts) > 1 else parts[0]
+        count = torch.as_tensor(self.valid[sel], device=dev, dtype=lines.dtype).view(-1, 1)
+        return lines, count
+
+    def rows_per_round(self, scans: int) -> int:
+        return max(1, _SCAN_BUDGET_ELEMS // max(1, scans * self.length * self.channels))
+
+
+def _line_profile(lines: torch.Tensor, count: torch.Tensor, fuzz_tol: float):
+    """
+    Uniformity profile of gathered lines [S, n, P, C] in one batched pass:
+    per-line base colour (channel medians over the valid pixels), uniformity
+    threshold from the line's MAD, and the fraction of the line within that
+    threshold of its own base. Returns host arrays (base, thresh, self_uf).
+    """
+    base = lines.nanmedian(dim=2).values                                   # [S, n, C]
+    self_dist = (lines - base.unsqueeze(2)).abs().mean(dim=-1)              # [S, n, P]
+    mad = self_dist.nanmedian(dim=2).values
+    # Same double-precision arithmetic as min(0.15, fuzz + mad * 2.5) on host floats.
+    thresh = (float(fuzz_tol) + mad.double() * 2.5).clamp(max=0.15)
+    self_uf = (self_dist <= thresh.float().unsqueeze(2)).float().sum(dim=2) / count
+    C = base.shape[-1]
+    host = torch.cat([base.double(), thresh.unsqueeze(-1), self_uf.double().unsqueeze(-1)], dim=-1).cpu().numpy()
+    return host[..., :C].astype(np.float32), host[..., C], host[..., C + 1].astype(np.float32)
+
+
+def _match_runs(scans: _EdgeScans, sel, start, base, thresh, edge_unif):
+    """
+    Rows each selected scan may advance from `start`: up to the first
+    _GAP_N-wide wall of lines not sharing its base colour. All scans are
+    compared together in doubling chunks (one gather and transfer per round)
+    and each scan stops reading at its first wall.
+    """
+    dev = scans.img.device
+    remaining = scans.limit[sel] - start
+    seen = [np.zeros(0, dtype=bool) for _ in sel]
+    runs = np.full(len(sel), -1)
+    base_t = torch.as_tensor(base, device=dev).view(len(sel), 1, 1, -1)
+    thresh_t = torch.as_tensor(thresh, device=dev).float().view(len(sel), 1, 1)
+    chunk = _MATCH_CHUNK
+    while (runs < 0).any():
+        todo = np.flatnonzero(runs < 0)
+        done = np.array([seen[j].shape[0] for j in todo])
+        n = int(min(chunk, scans.rows_per_round(len(todo)), (remaining[todo] - done).max()))
+        offs = start[todo, None] + done[:, None] + np.arange(n)
+        lines, count = scans.gather(sel[todo], offs)
+        dist = (lines - base_t[todo]).abs().mean(dim=-1)
+        uf = (dist <= thresh_t[todo]).float().sum(dim=2) / count
+        matches = (uf >= float(edge_unif)).cpu().numpy()
+        chunk *= 2
+        for row, j in enumerate(todo):
+            L = remaining[j]
+            seen[j] = np.concatenate([seen[j], matches[row, : max(0, L - seen[j].shape[0])]])
+            if L < _GAP_N:
+                if seen[j].shape[0] >= L:
+                    # Revert to linear contiguous scan on margins too thin to gap-jump
+                    runs[j] = int(np.cumprod(seen[j]).sum())
+                continue
             # Snap the break point to the very first triggering gap wall instance
-            break_points = torch.where(zero_blocks > N - 0.5)[0]
-            
-            if len(break_points) == 0:
-                run = L
-            else:
-                run = int(break_points[0].item())
-                
-        if run == 0:
+            wall = _first_wall(seen[j])
+            if wall >= 0:
+                runs[j] = wall
+            elif seen[j].shape[0] >= L:
+                runs[j] = L
+    return runs
+
+
+def _scan_edges(img: torch.Tensor, roi_h: np.ndarray, enabled: np.ndarray, fuzz_tol: float, edge_unif: float):
+    """
+    Border widths [B, 4] (top, bottom, left, right) of every image's ROI
+    (rows [0, roi_h), all columns), scanned inward together. Each round
+    profiles the line every live scan has reached, applies the stopping rules
+    on host arrays and advances all surviving scans at once.
+    """
+    B = img.shape[0]
+    scans = _EdgeScans(img, roi_h)
+    S = 4 * B
+    trim = np.zeros(S, dtype=np.int64)
+    active = np.tile(enabled, 4) & (scans.limit > 0)
+    prev_base = np.zeros((S, img.shape[-1]), dtype=np.float32)
+    has_prev = np.zeros(S, dtype=bool)
+    edge_unif32 = np.float32(edge_unif)   # the threshold as compared against float32 fractions
+
+    while active.any():
+        # Profile the line every live scan has reached (one gather + transfer for the batch).
+        sel = np.flatnonzero(active)
+        lines, count = scans.gather(sel, trim[sel, None])
+        base, thresh, self_uf = (v[:, 0] for v in _line_profile(lines, count.view(-1, 1), fuzz_tol))
+        del lines
+
+        go = np.zeros(sel.size, dtype=bool)
+        for j, s in enumerate(sel):
+            if has_prev[s]:
+                color_jump = float(np.abs(base[j] - prev_base[s]).mean())
+                if color_jump < max(0.10, thresh[j] * 2.0):
+                    continue
+            # Ensures respect for bounding edge parameter immediately rather than hard-locking
+            if self_uf[j] < edge_unif32:
+                continue
+            go[j] = True
+
+        active[sel[~go]] = False
+        if not go.any():
             break
-            
-        trim += run
-        prev_base = base_color
-        
-    return trim
+        sel, base, thresh = sel[go], base[go], thresh[go]
+        runs = _match_runs(scans, sel, trim[sel], base, thresh, edge_unif)
+        active[sel[runs == 0]] = False
+        moved = runs > 0
+        trim[sel[moved]] += runs[moved]
+        prev_base[sel[moved]] = base[moved]
+        has_prev[sel[moved]] = True
+        active &= trim < scans.limit
+
+    return trim.reshape(4, B).T
+
+
+def _bottom_banners(img: torch.Tensor) -> np.ndarray:
+    """Rows to strip for a dark caption banner at the bottom of each image ([B] ints, 0 = none)."""
+    B, H, W, C = img.shape
+    scan_rows = max(1, int(H * 0.15))
+    region = _rgb_to_luma(img[:, -scan_rows:])                      # [B, scan_rows, W]
+
+    dark_thresh = 0.22
+    bright_thresh = 0.70
+
+    row_mean = region.mean(dim=2)
+    bright_frac = (region >= bright_thresh).float().mean(dim=2)
+    # Trailing run of dark rows, counted up from the bottom edge.
+    trailing = (row_mean <= dark_thresh).flip(1).to(torch.int32).cumprod(dim=1).bool()
+    trim_count = trailing.sum(dim=1)
+    seen_bright = (trailing & (bright_frac.flip(1) >= 0.005)).any(dim=1)
+    trims = torch.where((trim_count >= 2) & seen_bright, trim_count + 2, torch.zeros_like(trim_count))
+    return trims.cpu().numpy()
+
 
 class IntelligentAutoCrop:
     @classmethod
@@ -91,97 +238,64 @@ class IntelligentAutoCrop:
     def _run_inner(self, image, strip_bottom_banner=True, detect_borders=True, fuzz_tolerance=0.04, edge_uniformity=0.75, pad_px=0):
         img = enforce_image_format(image, force_rgb=True)
         B, H, W, C = img.shape
-        
+
+        # 1. Strip Bottom Banner (whole batch at once)
+        if strip_bottom_banner and H > 32:
+            bottom_trim = _bottom_banners(img)
+        else:
+            bottom_trim = np.zeros(B, dtype=np.int64)
+        detected = bottom_trim > 0
+        roi_h = H - bottom_trim
+
+        # 2. Adaptive Rolling Scan: all four borders of every image, scanned together
+        trims = np.zeros((B, 4), dtype=np.int64)
+        if detect_borders and W > 16:
+            enabled = roi_h > 16
+            if enabled.any():
+                trims = _scan_edges(img, roi_h, enabled, fuzz_tolerance, edge_uniformity)
+
         out_images = []
         l_total = t_total = r_total = b_total = 0
-        detected_any = False
-        
         for b in range(B):
-            work = img[b] # [H,W,C]
-            curr_h, curr_w = H, W
-            curr_bottom_trim = 0
-            
-            # 1. Strip Bottom Banner
-            if strip_bottom_banner and curr_h > 32:
-                gray = _rgb_to_luma(work)
-                scan_rows = max(1, int(curr_h * 0.15))
-                region = gray[-scan_rows:, :]
-                
-                dark_thresh = 0.22
-                bright_thresh = 0.70
-                
-                row_mean = region.mean(dim=1)
-                bright_frac = (region >= bright_thresh).float().mean(dim=1)
-                is_dark_row = row_mean <= dark_thresh
-                
-                trim_count = 0
-                seen_bright = False
-                for r in range(scan_rows - 1, -1, -1):
-                    if is_dark_row[r]:
-                        trim_count += 1
-                        if bright_frac[r] >= 0.005:
-                            seen_bright = True
-                    else:
-                        break
-                
-                if trim_count >= 2 and seen_bright:
-                    curr_bottom_trim = trim_count + 2
-                    detected_any = True
-            
-            w_start, w_end = 0, curr_h - curr_bottom_trim
-            h_start, h_end = 0, curr_w
-            
-            # 2. Adaptive Rolling Scan
-            if detect_borders and (w_end - w_start) > 16 and (h_end - h_start) > 16:
-                roi = work[w_start:w_end, h_start:h_end, :]
-                roi_c = roi.contiguous()
-                roi_t = roi_c.permute(1, 0, 2).contiguous()
-                
-                # Scan all four borders iteratively and independently
-                r_top = _scan_edge(roi_c, fuzz_tolerance, edge_uniformity)
-                r_bot = _scan_edge(roi_c.flip(0), fuzz_tolerance, edge_uniformity)
-                c_lef = _scan_edge(roi_t, fuzz_tolerance, edge_uniformity)
-                c_rig = _scan_edge(roi_t.flip(0), fuzz_tolerance, edge_uniformity)
-
-                # Free staging tensors immediately
-                del roi_c, roi_t
-                
-                if r_top > 0 or r_bot > 0 or c_lef > 0 or c_rig > 0:
-                    r_top = max(0, r_top - pad_px)
-                    r_bot = max(0, r_bot - pad_px)
-                    c_lef = max(0, c_lef - pad_px)
-                    c_rig = max(0, c_rig - pad_px)
-                    
-                    new_w_start = w_start + r_top
-                    new_w_end = w_end - r_bot
-                    new_h_start = h_start + c_lef
-                    new_h_end = h_end - c_rig
-                    
-                    if new_w_start < new_w_end and new_h_start < new_h_end:
-                        w_start, w_end = new_w_start, new_w_end
-                        h_start, h_end = new_h_start, new_h_end
-                        detected_any = True
-            
-            out_images.append(work[w_start:w_end, h_start:h_end, :])
+            w_start, w_end = 0, int(roi_h[b])
+            h_start, h_end = 0, W
+            r_top, r_bot, c_lef, c_rig = (int(v) for v in trims[b])
+
+            if r_top > 0 or r_bot > 0 or c_lef > 0 or c_rig > 0:
+                r_top = max(0, r_top - pad_px)
+                r_bot = max(0, r_bot - pad_px)
+                c_lef = max(0, c_lef - pad_px)
+                c_rig = max(0, c_rig - pad_px)
+
+                new_w_start = w_start + r_top
+                new_w_end = w_end - r_bot
+                new_h_start = h_start + c_lef
+                new_h_end = h_end - c_rig
+
+                if new_w_start < new_w_end and new_h_start < new_h_end:
+                    w_start, w_end = new_w_start, new_w_end
+                    h_start, h_end = new_h_start, new_h_end
+                    detected[b] = True
+
+            out_images.append(img[b, w_start:w_end, h_start:h_end, :])
             if b == 0:
                 l_total = h_start
                 t_total = w_start
                 r_total = W - h_end
                 b_total = H - w_end
+        detected_any = bool(detected.any())
 
         if B > 1:
             max_h = max(c.shape[0] for c in out_images)
             max_w = max(c.shape[1] for c in out_images)
-            padded = []
-            for c in out_images:
-                pad_h = max_h - c.shape[0]
-                pad_w = max_w - c.shape[1]
-                padded.append(F.pad(c, (0, 0, 0, pad_w, 0, pad_h)).unsqueeze(0))
-            final_out = torch.cat(padded, dim=0)
+            # img is already clamped to [0, 1]; crops are copied once into the padded batch.
+            final_out = img.new_zeros((B, max_h, max_w, C))
+            for b, c in enumerate(out_images):
+                final_out[b, : c.shape[0], : c.shape[1]] = c
         else:
             final_out = out_images[0].unsqueeze(0)
-            
-        return (final_out.clamp(0.0, 1.0), int(l_total), int(t_total), int(r_total), int(b_total), detected_any)
+
+        return (final_out, int(l_total), int(t_total), int(r_total), int(b_total), detected_any)
 
 NODE_CLASS_MAPPINGS = {
     "IntelligentAutoCrop": IntelligentAutoCrop,
@@ -1,100 +1,176 @@
-import math
 import numpy as np
 import torch
+import torch.nn.functional as F
 
+from .image_utils import enforce_image_format
 
-def _to_numpy_mask(m):
-    if torch is not None and isinstance(m, torch.Tensor):
-        arr = m.detach().cpu().numpy()
-    elif isinstance(m, dict) and "mask" in m:
-        v = m["mask"]
-        arr = v.detach().cpu().numpy() if torch is not None and isinstance(v, torch.Tensor) else np.asarray(v)
-    else:
-        arr = np.asarray(m)
-    arr = np.squeeze(arr)
-    if arr.ndim == 3:
-        arr = arr.max(axis=0) if arr.shape[0] in (1, 3, 4) else arr.max(axis=-1)
-    if arr.ndim != 2:
-        h, w = arr.shape[-2], arr.shape[-1]
-        arr = arr.reshape(h, w)
-    return arr.astype(np.float32, copy=False)
+
+def _to_mask_batch(m):
+    """MASK input as a float32 [B, H, W] tensor, left on its current device."""
+    if isinstance(m, dict) and "mask" in m:
+        m = m["mask"]
+    t = m.detach() if isinstance(m, torch.Tensor) else torch.as_tensor(np.asarray(m))
+    t = t.to(torch.float32)
+    if t.dim() == 4:
+        # [B, H, W, C] or [B, C, H, W]: collapse the channel axis
+        t = t.amax(dim=-1) if t.shape[-1] in (1, 3, 4) else t.amax(dim=1)
+    elif t.dim() == 3 and t.shape[-1] in (1, 3, 4) and t.shape[0] not in (1, 3, 4):
+        t = t.amax(dim=-1, keepdim=False).unsqueeze(0)  # single [H, W, C] mask
+    elif t.dim() == 2:
+        t = t.unsqueeze(0)
+    if t.dim() != 3:
+        h, w = t.shape[-2], t.shape[-1]
+        t = t.reshape(-1, h, w)
+    return t
+
+
+def _mask_scale(m):
+    # Per image: masks stored as 0..255 are read as 0..1. Returned as a [B, 1]
+    # factor so the (linear) projections can be rescaled instead of the mask.
+    mmax = m.amax(dim=(1, 2))
+    return torch.where(mmax > 1.5, 1.0 / 255.0, 1.0).to(torch.float64).view(-1, 1)
 
 
 def _normalize01(m):
-    mmax = float(m.max()) if m.size else 0.0
-    if mmax <= 0:
-        return m
-    if mmax > 1.5:
-        return (m / 255.0).astype(np.float32, copy=False)
-    return m
-
-
-def _border_mass_ratio(m, border_px=8):
-    H, W = m.shape
-    border_px = int(max(1, min(border_px, min(H, W) // 4)))
-    total = float(m.sum()) + 1e-12
-    top = m[:border_px, :].sum()
-    bottom = m[-border_px:, :].sum()
-    left = m[:, :border_px].sum()
-    right = m[:, -border_px:].sum()
-    corners = (
-        m[:border_px, :border_px].sum()
-        + m[:border_px, -border_px:].sum()
-        + m[-border_px:, :border_px].sum()
-        + m[-border_px:, -border_px:].sum()
+    return m * _mask_scale(m).to(m.dtype).view(-1, 1, 1)
+
+
+def _border_sums(m, scale, border_px=8):
+    """Per-image scaled mass inside the border band ([B] float64) and the band area, read from the edge strips only."""
+    B, H, W = m.shape
+    bp = int(max(1, min(border_px, min(H, W) // 4)))
+    # Left/right strips skip the corners already counted in top/bottom.
+    middle = m[:, bp:H - bp]
+    border = (
+        m[:, :bp].sum(dim=(1, 2)).double()
+        + m[:, -bp:].sum(dim=(1, 2)).double()
+        + middle[:, :, :bp].sum(dim=(1, 2)).double()
+        + middle[:, :, -bp:].sum(dim=(1, 2)).double()
     )
-    border = top + bottom + left + right - corners
-    return float(border) / total
+    band_area = float(2 * bp * W + 2 * bp * max(0, H - 2 * bp))
+    return border * scale.view(-1), band_area
 
 
-def _auto_pick_foreground(m, mode="auto"):
-    m = _normalize01(m)
+def _pick_foreground(m, scale, total, mode):
+    """Per-image inversion flags ([B, 1] bool) and pick labels, from the border masses."""
+    B, H, W = m.shape
     if mode == "false":
-        fg, pick = m, "fg"
-    elif mode == "true":
-        fg, pick = 1.0 - m, "bg"
-    else:
-        r_fg = _border_mass_ratio(m)
-        r_bg = _border_mass_ratio(1.0 - m)
-        if r_bg < r_fg:
-            fg, pick = 1.0 - m, "auto->bg"
-        else:
-            fg, pick = m, "auto->fg"
-    return fg, pick
+        return torch.zeros(B, 1, dtype=torch.bool, device=m.device), ["fg"] * B
+    if mode == "true":
+        return torch.ones(B, 1, dtype=torch.bool, device=m.device), ["bg"] * B
+    border, band_area = _border_sums(m, scale)
+    r_fg = border / (total + 1e-12)
+    r_bg = (band_area - border) / (float(H * W) - total + 1e-12)
+    flip = r_bg < r_fg
+    return flip.view(B, 1), ["auto->bg" if f else "auto->fg" for f in flip.tolist()]
+
+
+def _foreground_projections(m, mode="auto"):
+    """
+    Column and row sums ([B, W], [B, H] float64) of the chosen foreground for
+    every mask, plus the [B, 1] inversion flags and per-image pick labels. Normalisation and inversion are
+    applied to the projections, so no full-size temporary is materialised.
+    """
+    B, H, W = m.shape
+    scale = _mask_scale(m)
+    # Reduce in float32 along one axis (<= a few thousand terms), accumulate the rest in float64.
+    cols = m.sum(dim=1).double() * scale
+    rows = m.sum(dim=2).double() * scale
+    flip, labels = _pick_foreground(m, scale, rows.sum(dim=1), mode)
+    cols = torch.where(flip, H - cols, cols)
+    rows = torch.where(flip, W - rows, rows)
+    return cols, rows, flip, labels
+
+
+def _finish_bounds(x0, x1, y0, y1, W, H, min_span):
+    """Order the edge indices, widen spans shorter than min_span and pack [B, 4] int64 (x, y, w, h)."""
+    x0, x1 = torch.minimum(x0, x1), torch.maximum(x0, x1)
+    y0, y1 = torch.minimum(y0, y1), torch.maximum(y0, y1)
+    half = max(1, int(min_span) // 2)
+
+    def widen(a0, a1, limit):
+        short = (a1 - a0 + 1) < min_span
+        c = (a0 + a1) // 2
+        return (torch.where(short, (c - half).clamp(min=0), a0),
+                torch.where(short, (c + half).clamp(max=limit - 1), a1))
+
+    x0, x1 = widen(x0, x1, W)
+    y0, y1 = widen(y0, y1, H)
+    return torch.stack([x0, y0, x1 - x0 + 1, y1 - y0 + 1], dim=1)
+
+
+def _quantile_bounds(cols, rows, qL, qR, qT, qB, min_span):
+    """Quantile box of every mask from its projections — [B, 4] int64 (x, y, w, h)."""
+    eps = 1e-8
+    cc = torch.cumsum(cols + eps, dim=1)
+    rc = torch.cumsum(rows + eps, dim=1)
+
+    def qidx(cum, q):
+        target = cum[:, -1:] * float(q)
+        return torch.searchsorted(cum, target, side="left").clamp_(0, cum.shape[1] - 1).squeeze(1)
+
+    return _finish_bounds(qidx(cc, qL), qidx(cc, qR), qidx(rc, qT), qidx(rc, qB),
+                          cols.shape[1], rows.shape[1], min_span)
 
 
-def _quantile_bounds(mass, qL, qR, qT, qB, min_span):
-    H, W = mass.shape
+# Pyramid mode: quantiles are located on factor x factor block sums, then each
+# edge is resolved inside a single factor-wide band of the full-res mask.
+PYRAMID_FACTOR = 8
+
+
+def _refine_edges(m, coarse, flip, scale, qs, factor):
+    """
+    Quantile indices along the last axis of m ([B, other, N], any strides) for
+    each q in qs. coarse holds the scaled, foreground-oriented block sums
+    [B, ceil(N / factor)]; only the block holding each quantile is re-read.
+    """
+    B, other, N = m.shape
     eps = 1e-8
-    c = mass.sum(axis=0) + eps
-    r = mass.sum(axis=1) + eps
-    cc = np.cumsum(c)
-    rc = np.cumsum(r)
-    ct = float(cc[-1])
-    rt = float(rc[-1])
-
-    def qidx(cum, total, q):
-        return int(np.clip(np.searchsorted(cum, total * float(q), "left"), 0, len(cum) - 1))
-
-    x0 = qidx(cc, ct, qL)
-    x1 = qidx(cc, ct, qR)
-    y0 = qidx(rc, rt, qT)
-    y1 = qidx(rc, rt, qB)
-    if x1 < x0:
-        x0, x1 = x1, x0
-    if y1 < y0:
-        y0, y1 = y1, y0
-    if (x1 - x0 + 1) < min_span:
-        cx = (x0 + x1) // 2
-        half = max(1, min_span // 2)
-        x0 = max(0, cx - half)
-        x1 = min(W - 1, cx + half)
-    if (y1 - y0 + 1) < min_span:
-        cy = (y0 + y1) // 2
-        half = max(1, min_span // 2)
-        y0 = max(0, cy - half)
-        y1 = min(H - 1, cy + half)
-    return int(x0), int(y0), int(x1 - x0 + 1), int(y1 - y0 + 1)
+    dev = m.device
+    starts = torch.arange(0, N, factor, device=dev)
+    widths = (N - starts).clamp(max=factor)
+    cum = torch.cumsum(coarse + eps * widths.to(torch.float64), dim=1)
+    offs = torch.arange(factor, device=dev)
+    edges = []
+    for q in qs:
+        target = cum[:, -1:] * float(q)
+        k = torch.searchsorted(cum, target, side="left").clamp_(0, cum.shape[1] - 1)     # [B, 1]
+        prefix = torch.where(k > 0, cum.gather(1, (k - 1).clamp(min=0)), torch.zeros_like(target))
+        pos = k * factor + offs                                                            # [B, factor]
+        valid = pos < N
+        idx = pos.clamp(max=N - 1)
+        band = torch.gather(m, 2, idx.unsqueeze(1).expand(B, other, factor)).sum(dim=1).double() * scale
+        band = torch.where(flip, other - band, band)
+        fine = prefix + torch.cumsum(torch.where(valid, band + eps, torch.zeros_like(band)), dim=1)
+        # first in-band index reaching the target (the band total can differ from the
+        # block sum by rounding, so stay inside the block)
+        j = (fine < target).sum(dim=1, keepdim=True)
+        j = torch.minimum(j, widths[k] - 1)
+        edges.append((k * factor + j).squeeze(1))
+    return edges
+
+
+def _pyramid_bounds(m, mode, qL, qR, qT, qB, min_span, factor=PYRAMID_FACTOR):
+    """
+    Pyramid variant of _foreground_projections + _quantile_bounds: one block-sum
+    pass over the mask, border mass from the edge strips, then four narrow
+    full-res bands. Agrees with the full-res box to within one pixel.
+    """
+    B, H, W = m.shape
+    scale = _mask_scale(m)
+    blocks = F.avg_pool2d(m.unsqueeze(1), factor, stride=factor, ceil_mode=True, divisor_override=1)
+    blocks = blocks.squeeze(1).double() * scale.view(B, 1, 1)                           # [B, Hc, Wc]
+    cols = blocks.sum(dim=1)
+    rows = blocks.sum(dim=2)
+    flip, labels = _pick_foreground(m, scale, cols.sum(dim=1), mode)
+    if flip.any():
+        col_area = (W - torch.arange(0, W, factor, device=m.device)).clamp(max=factor).to(torch.float64) * H
+        row_area = (H - torch.arange(0, H, factor, device=m.device)).clamp(max=factor).to(torch.float64) * W
+        cols = torch.where(flip, col_area - cols, cols)
+        rows = torch.where(flip, row_area - rows, rows)
+    x0, x1 = _refine_edges(m, cols, flip, scale, (qL, qR), factor)
+    y0, y1 = _refine_edges(m.transpose(1, 2), rows, flip, scale, (qT, qB), factor)
+    return _finish_bounds(x0, x1, y0, y1, W, H, min_span), flip, labels
 
 
 def _pad_rect(x, y, w, h, pad, W, H):
@@ -132,6 +208,89 @@ def _container_for_ar(x, y, w, h, R, W, H):
     return X, Y, int(cw), int(ch)
 
 
+# Common ARs tried in BOTH orientations (includes 9:16)
+_SMART_RATIOS = [
+    (1, 1),
+    (2, 3),
+    (3, 2),
+    (3, 4),
+    (4, 3),
+    (9, 16),
+    (16, 9),
+]
+
+
+def _smart_container(x, y, w, h, W, H):
+    """Minimal-area AR container around a padded quantile box, or None when even the image AR does not fit."""
+    pad_px = max(8, int(round(0.02 * min(H, W))))
+    sx, sy, sw, sh = _pad_rect(x, y, w, h, pad_px, W, H)
+
+    # Baseline: container using current image AR
+    R0 = float(W) / max(1.0, float(H))
+    base = _container_for_ar(sx, sy, sw, sh, R0, W, H)
+    if base is None:
+        return None
+    bx, by, bw, bh = base
+
+    best_rect = base
+    best_area = bw * bh
+    best_info = f"AR={W}:{H}"
+    for aw, ah in _SMART_RATIOS:
+        R = float(aw) / float(ah)
+        cand = _container_for_ar(sx, sy, sw, sh, R, W, H)
+        if cand is None:
+            continue
+        cx, cy, cw, ch = cand
+        area = cw * ch
+        if area < best_area:
+            best_area = area
+            best_rect = cand
+            best_info = f"AR={aw}:{ah}"
+    return best_rect, best_info, pad_px
+
+
+def _union_box(boxes):
+    """Single (x, y, w, h) covering every row of an [N, 4] box list."""
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[0] + b[2] for b in boxes)
+    y1 = max(b[1] + b[3] for b in boxes)
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+
+def _subject_boxes(m, invert_mask, q_left, q_right, q_top, q_bottom, min_span_px, pyramid=False):
+    """
+    Tight subject box of every mask in m ([B, H, W], any device): quantile
+    bounds for the whole batch, then the smart-AR container per box on the
+    host. Returns the [(x, y, w, h)] int boxes, the [B, 1] foreground
+    inversion flags and one debug line per mask.
+    """
+    B, H, W = m.shape
+    use_pyramid = bool(pyramid) and min(H, W) >= 4 * PYRAMID_FACTOR
+    if use_pyramid:
+        mq, flip, picks = _pyramid_bounds(m, invert_mask, q_left, q_right, q_top, q_bottom, int(min_span_px))
+        picks = [f"{p} pyr=1/{PYRAMID_FACTOR}" for p in picks]
+    else:
+        cols, rows, flip, picks = _foreground_projections(m, invert_mask)
+        mq = _quantile_bounds(cols, rows, q_left, q_right, q_top, q_bottom, int(min_span_px))
+    mq = mq.tolist()
+
+    # --- smart AR (minimal-area container), internal only: scalar work per box ---
+    final, lines = [], []
+    for (x, y, w, h), picked in zip(mq, picks):
+        smart = _smart_container(x, y, w, h, W, H)
+        if smart is None:
+            final.append((x, y, w, h))
+            lines.append(f"tight=True pick={picked} mq=({x},{y},{w},{h})")
+            continue
+        (rx, ry, rw, rh), best_info, pad_px = smart
+        final.append((int(rx), int(ry), int(rw), int(rh)))
+        lines.append(
+            f"tight=True pick={picked} mq=({x},{y},{w},{h}) -> smart({rx},{ry},{rw},{rh}) {best_info}, pad={pad_px}"
+        )
+    return final, flip, lines
+
+
 class MQBBoxMin:
     @classmethod
     def INPUT_TYPES(cls):
@@ -151,69 +310,43 @@ class MQBBoxMin:
                         "tooltip": "ON: tight subject bbox with smart AR; OFF: full frame (minimal AR crop downstream).",
                     },
                 ),
-            }
+            },
+            "optional": {
+                "pyramid": (
+                    "BOOLEAN",
+                    {
+                        "default": False,
+                        "tooltip": "Find the bounds on 1/8-scale block sums and refine each edge in a full-res band "
+                        "(within 1 px of the full-res box; much less memory traffic on large masks).",
+                    },
+                ),
+            },
         }
 
-    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING")
-    RETURN_NAMES = ("x", "y", "w", "h", "debug")
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING", "BBOXES")
+    RETURN_NAMES = ("x", "y", "w", "h", "debug", "boxes")
     FUNCTION = "run"
     CATEGORY = "PortraitUtils/Transform"
 
-    def run(self, mask, invert_mask, q_left, q_right, q_top, q_bottom, min_span_px, tight_crop=True):
-        m = _to_numpy_mask(mask)
-        H, W = m.shape
-
-        if not tight_crop:
-            dbg = f"tight=False full=({0},{0},{W},{H})"
-            return (0, 0, int(W), int(H), dbg)
-
-        # --- original tight bbox ---
-        fg, picked = _auto_pick_foreground(m, invert_mask)
-        x, y, w, h = _quantile_bounds(fg, q_left, q_right, q_top, q_bottom, int(min_span_px))
-
-        # --- smart AR (minimal-area container), internal only ---
-        pad_px = max(8, int(round(0.02 * min(H, W))))
-        sx, sy, sw, sh = _pad_rect(x, y, w, h, pad_px, W, H)
-
-        # Baseline: container using current image AR
-        R0 = float(W) / max(1.0, float(H))
-        base = _container_for_ar(sx, sy, sw, sh, R0, W, H)
-        if base is None:
-            dbg = f"tight=True pick={picked} mq=({x},{y},{w},{h})"
-            return (x, y, w, h, dbg)
-        bx, by, bw, bh = base
-        base_area = bw * bh
-
-        # Try common ARs in BOTH orientations (includes 9:16)
-        ratios = [
-            (1, 1),
-            (2, 3),
-            (3, 2),
-            (3, 4),
-            (4, 3),
-            (9, 16),
-            (16, 9),
-        ]
+    def run(self, mask, invert_mask, q_left, q_right, q_top, q_bottom, min_span_px, tight_crop=True,
+            pyramid=False):
+        with torch.no_grad():
+            m = _to_mask_batch(mask)
+            B, H, W = m.shape
 
-        best_rect = base
-        best_area = base_area
-        best_info = f"AR={W}:{H}"
+            if not tight_crop:
+                boxes = torch.tensor([[0, 0, W, H]] * B, dtype=torch.int64)
+                dbg = f"tight=False full=({0},{0},{W},{H})"
+                return (0, 0, int(W), int(H), dbg, boxes)
 
-        for aw, ah in ratios:
-            R = float(aw) / float(ah)
-            cand = _container_for_ar(sx, sy, sw, sh, R, W, H)
-            if cand is None:
-                continue
-            cx, cy, cw, ch = cand
-            area = cw * ch
-            if area < best_area:
-                best_area = area
-                best_rect = cand
-                best_info = f"AR={aw}:{ah}"
+            final, _, lines = _subject_boxes(
+                m, invert_mask, q_left, q_right, q_top, q_bottom, min_span_px, pyramid
+            )
 
-        rx, ry, rw, rh = best_rect
-        dbg = f"tight=True pick={picked} mq=({x},{y},{w},{h}) -> smart({rx},{ry},{rw},{rh}) {best_info}, pad={pad_px}"
-        return (int(rx), int(ry), int(rw), int(rh), dbg)
+        boxes = torch.tensor(final, dtype=torch.int64).view(B, 4)
+        x, y, w, h = final[0] if B == 1 else _union_box(final)
+        dbg = lines[0] if B == 1 else "\n".join(f"[{i}] {line}" for i, line in enumerate(lines))
+        return (x, y, w, h, dbg, boxes)
 
 
 def _get_hw(image):
@@ -248,33 +381,222 @@ def _parse_aspects(s):
     return out or [(2 / 3.0, "2:3")]
 
 
-def _closest_ratio(target_ratio, candidates):
-    tr = float(target_ratio)
-    best = None
-    for r, tag in candidates:
-        d = abs(math.log(r) - math.log(tr))
-        if best is None or d < best[0]:
-            best = (d, r, tag)
-    return best[1], best[2]
+def _cover_min_rect_t(x0, y0, w0, h0, ratio):
+    """
+    Smallest rectangle of aspect 'ratio' covering the rect (x0,y0,w0,h0), as
+    float (xa,ya,wa,ha) not clamped to the image. Elementwise over broadcastable
+    float64 tensors; empty rects are returned unchanged.
+    """
+    r0 = w0 / torch.clamp(h0, min=1.0)
+    wide = r0 >= ratio
+    wa = torch.where(wide, w0, h0 * ratio)
+    ha = torch.where(wide, w0 / ratio, h0)
+    empty = (w0 <= 0) | (h0 <= 0)
+    cx = x0 + w0 / 2.0
+    cy = y0 + h0 / 2.0
+    return (
+        torch.where(empty, x0, cx - wa / 2.0),
+        torch.where(empty, y0, cy - ha / 2.0),
+        torch.where(empty, w0, wa),
+        torch.where(empty, h0, ha),
+    )
 
 
-def _cover_min_rect(x0, y0, w0, h0, ratio):
+def _head_safe_placement(x, y, w, h, ratio, H, W, headroom_ratio, footroom_ratio, side_margin_ratio,
+                         bottom_priority, horiz_gravity):
     """
-    Smallest rectangle of aspect 'ratio' that fully covers the rect (x0,y0,w0,h0).
-    Returns floats (xa,ya,wa,ha) without clamping to image.
+    Head-safe covering rect of aspect `ratio` around each subject box, with the
+    best of the four vertical placements. Inputs are broadcastable float64
+    tensors; returns a dict of float tensors in the broadcast shape.
     """
-    if w0 <= 0 or h0 <= 0:
-        return x0, y0, w0, h0
-    r0 = w0 / max(1.0, h0)
-    if r0 >= ratio:
-        wa = w0
-        ha = w0 / ratio
+    req_x0, req_y0 = x, y
+    req_x1, req_y1 = x + w, y + h
+
+    def cover(head_px, foot_px, side_px):
+        x0p, x1p = req_x0 - side_px, req_x1 + side_px
+        y0p, y1p = req_y0 - head_px, req_y1 + foot_px
+        return _cover_min_rect_t(x0p, y0p, torch.clamp(x1p - x0p, min=1.0), torch.clamp(y1p - y0p, min=1.0), ratio)
+
+    # First pass guesses margins from the full image height, second from the covering rect.
+    _, _, wa, ha = cover(headroom_ratio * H, footroom_ratio * H, side_margin_ratio * (H * ratio))
+    head_px = headroom_ratio * ha
+    foot_px = footroom_ratio * ha
+    side_px = side_margin_ratio * wa
+    xa, ya, wa, ha = cover(head_px, foot_px, side_px)
+
+    if horiz_gravity == "left":
+        xa = torch.zeros_like(xa)
+    elif horiz_gravity == "right":
+        xa = W - wa
     else:
-        ha = h0
-        wa = h0 * ratio
-    cx = x0 + w0 / 2.0
-    cy = y0 + h0 / 2.0
-    return cx - wa / 2.0, cy - ha / 2.0, wa, ha
+        xa = (x + w / 2.0) - wa / 2.0
+    xa = torch.minimum(xa, W - wa).clamp(min=0.0)
+
+    y_top_des = y - head_px
+    y_bot_des = (y + h) + foot_px
+    y_max = H - ha
+    candidates = torch.stack(
+        [
+            torch.minimum(y_top_des, y_max).clamp(min=0.0),
+            torch.minimum(y_bot_des - ha, y_max).clamp(min=0.0),
+            torch.zeros_like(y_max),
+            y_max,
+        ],
+        dim=-1,
+    )                                                                       # [..., 4]
+    loss_top = (y_top_des.unsqueeze(-1) - candidates).clamp(min=0.0)
+    loss_bot = (y_bot_des.unsqueeze(-1) - (candidates + ha.unsqueeze(-1))).clamp(min=0.0)
+    cost = (1.0 - bottom_priority) * loss_top + bottom_priority * loss_bot
+    best = torch.argmin(cost, dim=-1, keepdim=True)
+    ya = torch.minimum(candidates.gather(-1, best).squeeze(-1), y_max).clamp(min=0.0)
+    return {
+        "xa": xa,
+        "ya": ya,
+        "wa": wa,
+        "ha": ha,
+        "head_px": head_px,
+        "foot_px": foot_px,
+        "side_px": side_px,
+        "loss_top": loss_top.gather(-1, best).squeeze(-1),
+        "loss_bot": loss_bot.gather(-1, best).squeeze(-1),
+    }
+
+
+def _aspect_distance(boxes, H, W, ratios, match_to):
+    """|log r - log target| for every box and aspect — [B, A]."""
+    b = boxes.to(torch.float64)
+    if match_to == "image":
+        target = torch.full_like(b[:, 2], W / max(1.0, H))
+    else:
+        target = b[:, 2] / torch.clamp(b[:, 3], min=1.0)
+    return (torch.log(ratios).view(1, -1) - torch.log(target).view(-1, 1)).abs()
+
+
+def _fit_aspect_batch(boxes, H, W, aspects, match_to, headroom_ratio, footroom_ratio, side_margin_ratio,
+                      bottom_priority, horiz_gravity):
+    """
+    Head-safe aspect fit for every subject box at once. boxes is [B, 4]
+    (x, y, w, h); all aspects and the four vertical placements are scored in
+    one pass. Returns a dict of [B] tensors: the int64 crop rect (X, Y, Wc, Hc),
+    the chosen aspect index and the margins/violations used for debugging.
+    """
+    b = boxes.to(torch.float64)
+    x, y, w, h = b.unbind(dim=1)
+    ratios = torch.tensor([r for r, _ in aspects], dtype=torch.float64, device=b.device)
+
+    # Closest aspect in log space (first listed wins ties).
+    choice = torch.argmin(_aspect_distance(b, H, W, ratios, match_to), dim=1)
+    fit = _head_safe_placement(
+        x, y, w, h, ratios[choice], H, W, headroom_ratio, footroom_ratio, side_margin_ratio,
+        bottom_priority, horiz_gravity,
+    )
+
+    X = torch.round(fit["xa"]).to(torch.int64).clamp(0, W - 1)
+    Y = torch.round(fit["ya"]).to(torch.int64).clamp(0, H - 1)
+    Wc = torch.minimum(torch.round(fit["wa"]).to(torch.int64), W - X).clamp(min=1)
+    Hc = torch.minimum(torch.round(fit["ha"]).to(torch.int64), H - Y).clamp(min=1)
+    fit["rect"] = torch.stack([X, Y, Wc, Hc], dim=1)
+    fit["choice"] = choice
+    return fit
+
+
+# Mask-guided search: the subject mask is reduced once to a full-resolution
+# summed-area table, then a dense grid of (aspect, x, y) crops is scored by
+# exact subject coverage with four lookups each.
+_SAT_GRID = 12
+
+
+def _mask_at_size(m, H, W):
+    """Resize a [B, h, w] mask to the image size (no-op when it already matches)."""
+    if m.shape[-2:] == (H, W):
+        return m
+    return F.interpolate(m.unsqueeze(1), size=(H, W), mode="bilinear", align_corners=False).squeeze(1)
+
+
+def _mask_sat(m, H, W):
+    """Integral image [B, H+1, W+1] (float64) of a 0..1 subject mask at image size."""
+    # Pad and widen once, then accumulate in place: one float64 buffer at peak.
+    sat = F.pad(_mask_at_size(m, H, W), (1, 0, 1, 0)).to(torch.float64)
+    return sat.cumsum_(dim=1).cumsum_(dim=2)
+
+
+def _box_mass(sat, x0, y0, x1, y1):
+    """Exact mask mass inside pixel rects [x0, x1) x [y0, y1); coordinates are int64 [B, N]."""
+    B, Hs, Ws = sat.shape
+    cx0, cx1 = x0.clamp(0, Ws - 1), x1.clamp(0, Ws - 1)
+    cy0, cy1 = y0.clamp(0, Hs - 1), y1.clamp(0, Hs - 1)
+    flat = sat.reshape(B, -1)
+
+    def at(cy, cx):
+        return flat.gather(1, cy * Ws + cx)
+
+    return at(cy1, cx1) - at(cy0, cx1) - at(cy1, cx0) + at(cy0, cx0)
+
+
+def _fit_aspect_mask(boxes, sat, H, W, aspects, match_to, aspect_penalty, headroom_ratio, footroom_ratio,
+                     side_margin_ratio, bottom_priority, horiz_gravity, grid=_SAT_GRID):
+    """
+    Dense mask-guided fit. For every aspect the head-safe cover size is kept
+    (shrunk to fit the image); x and y sweep a grid plus the head-safe
+    placement. Score = coverage - aspect_penalty * log-ratio distance, with the
+    head-safe placement winning ties. Returns rect [B, 4], aspect index,
+    coverage [B] and the candidate count.
+    """
+    b = boxes.to(torch.float64)
+    B = b.shape[0]
+    dev = sat.device
+    ratios = torch.tensor([r for r, _ in aspects], dtype=torch.float64, device=dev)
+    A = ratios.shape[0]
+    x, y, w, h = (v.to(dev).view(B, 1) for v in b.unbind(dim=1))
+    fit = _head_safe_placement(
+        x, y, w, h, ratios.view(1, A), H, W, headroom_ratio, footroom_ratio, side_margin_ratio,
+        bottom_priority, horiz_gravity,
+    )                                                                       # [B, A]
+
+    # Aspect-correct crop sizes that fit inside the image.
+    shrink = torch.minimum(W / fit["wa"], H / fit["ha"]).clamp(max=1.0)
+    Wc = torch.round(fit["wa"] * shrink).to(torch.int64).clamp(1, W)
+    Hc = torch.round(fit["ha"] * shrink).to(torch.int64).clamp(1, H)
+    # Preferred placement: the head-safe one, or for shrunk crops the same
+    # gravity with the headroom scaled down.
+    shrunk = shrink < 1.0
+    if horiz_gravity == "left":
+        x_grav = torch.zeros_like(fit["xa"])
+    elif horiz_gravity == "right":
+        x_grav = W - Wc.to(torch.float64)
+    else:
+        x_grav = (x + w / 2.0) - Wc / 2.0
+    x_pref = torch.round(torch.where(shrunk, x_grav, fit["xa"])).to(torch.int64)
+    y_pref = torch.round(torch.where(shrunk, y - fit["head_px"] * shrink, fit["ya"])).to(torch.int64)
+    x_pref = torch.minimum(x_pref, W - Wc).clamp(min=0)
+    y_pref = torch.minimum(y_pref, H - Hc).clamp(min=0)
+
+    steps = torch.linspace(0.0, 1.0, grid, dtype=torch.float64, device=dev)
+    xs = torch.cat([x_pref.unsqueeze(-1), torch.round((W - Wc).unsqueeze(-1) * steps).to(torch.int64)], dim=-1)
+    ys = torch.cat([y_pref.unsqueeze(-1), torch.round((H - Hc).unsqueeze(-1) * steps).to(torch.int64)], dim=-1)
+    n = grid + 1
+    X = xs.view(B, A, 1, n).expand(B, A, n, n)
+    Y = ys.view(B, A, n, 1).expand(B, A, n, n)
+    Wb = Wc.view(B, A, 1, 1).expand(B, A, n, n)
+    Hb = Hc.view(B, A, 1, 1).expand(B, A, n, n)
+
+    flat = lambda t: t.reshape(B, -1)                                       # noqa: E731
+    mass = _box_mass(sat, flat(X), flat(Y), flat(X + Wb), flat(Y + Hb))
+    total = sat[:, -1, -1].view(B, 1)
+    coverage = torch.where(total > 1e-9, mass / total.clamp(min=1e-9), torch.ones_like(mass))
+
+    dist = _aspect_distance(b.to(dev), H, W, ratios, match_to).view(B, A, 1, 1)
+    drift = (X - x_pref.view(B, A, 1, 1)).abs() / float(W) + (Y - y_pref.view(B, A, 1, 1)).abs() / float(H)
+    score = coverage.view(B, A, n, n) - aspect_penalty * dist - 1e-3 * drift
+    best = torch.argmax(flat(score), dim=1, keepdim=True)
+    rect = torch.stack([flat(X), flat(Y), flat(Wb), flat(Hb)], dim=-1)
+    rect = rect.gather(1, best.unsqueeze(-1).expand(B, 1, 4)).squeeze(1)
+    return {
+        "rect": rect,
+        "choice": torch.div(best.squeeze(1), n * n, rounding_mode="floor"),
+        "coverage": coverage.gather(1, best).squeeze(1),
+        "candidates": A * n * n,
+    }
 
 
 class FitAspectHeadSafe:
@@ -283,10 +605,10 @@ class FitAspectHeadSafe:
         return {
             "required": {
                 "image": ("IMAGE",),
-                "x": ("INT",),
-                "y": ("INT",),
-                "w": ("INT",),
-                "h": ("INT",),
+                "x": ("INT", {"tooltip": "Subject box left edge in pixels. Ignored when boxes is connected."}),
+                "y": ("INT", {"tooltip": "Subject box top edge in pixels. Ignored when boxes is connected."}),
+                "w": ("INT", {"tooltip": "Subject box width in pixels. Ignored when boxes is connected."}),
+                "h": ("INT", {"tooltip": "Subject box height in pixels. Ignored when boxes is connected."}),
                 "aspects_csv": (
                     "STRING",
                     {"default": "2:3,3:4,1:1,9:16,16:9,5:8,8:5"},
@@ -297,11 +619,31 @@ class FitAspectHeadSafe:
                 "side_margin_ratio": ("FLOAT", {"default": 0.08, "min": 0.0, "max": 0.5, "step": 0.01}),
                 "bottom_priority": ("FLOAT", {"default": 0.75, "min": 0.0, "max": 1.0, "step": 0.05}),
                 "horiz_gravity": (["center", "left", "right"], {"default": "center"}),
-            }
+            },
+            "optional": {
+                "boxes": (
+                    "BBOXES",
+                    {"tooltip": "Per-image (x, y, w, h) boxes, e.g. from MQ BBox. Overrides x/y/w/h and fits the whole batch."},
+                ),
+                "mask": (
+                    "MASK",
+                    {"tooltip": "Subject mask (white = subject). Enables a dense crop search scored by subject coverage."},
+                ),
+                "aspect_penalty": (
+                    "FLOAT",
+                    {
+                        "default": 0.25,
+                        "min": 0.0,
+                        "max": 4.0,
+                        "step": 0.05,
+                        "tooltip": "Mask search only: coverage traded per unit of log-ratio distance from the matched aspect.",
+                    },
+                ),
+            },
         }
 
-    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING", "STRING")
-    RETURN_NAMES = ("w", "h", "x", "y", "aspect_used", "debug")
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING", "STRING", "BBOXES")
+    RETURN_NAMES = ("w", "h", "x", "y", "aspect_used", "debug", "rects")
     FUNCTION = "run"
     CATEGORY = "PortraitUtils/Transform"
 
@@ -319,115 +661,224 @@ class FitAspectHeadSafe:
         side_margin_ratio,
         bottom_priority,
         horiz_gravity,
+        boxes=None,
+        mask=None,
+        aspect_penalty=0.25,
     ):
 
         H, W = _get_hw(image)
-        img_ratio = W / max(1.0, H)
-        mq_ratio = w / max(1.0, h)
-        target_ratio = img_ratio if match_to == "image" else mq_ratio
+        if boxes is None:
+            boxes = torch.tensor([[x, y, w, h]], dtype=torch.int64)
+        else:
+            boxes = torch.as_tensor(boxes).reshape(-1, 4)
 
         aspects = _parse_aspects(aspects_csv)
-        ratio, tag = _closest_ratio(target_ratio, aspects)
-
-        req_x0 = x
-        req_y0 = y
-        req_x1 = x + w
-        req_y1 = y + h
-
-        guess_h = H
-        head_px = headroom_ratio * guess_h
-        foot_px = footroom_ratio * guess_h
-        side_px = side_margin_ratio * (guess_h * ratio)
-
-        req_x0p = req_x0 - side_px
-        req_x1p = req_x1 + side_px
-        req_y0p = req_y0 - head_px
-        req_y1p = req_y1 + foot_px
-
-        xa, ya, wa, ha = _cover_min_rect(
-            req_x0p,
-            req_y0p,
-            max(1.0, req_x1p - req_x0p),
-            max(1.0, req_y1p - req_y0p),
-            ratio,
-        )
+        lines = []
+        if mask is not None:
+            with torch.no_grad():
+                sat = _mask_sat(_normalize01(_to_mask_batch(mask)), H, W)
+                if sat.shape[0] not in (1, boxes.shape[0]):
+                    raise ValueError(
+                        f"FitAspectHeadSafe: {sat.shape[0]} masks for {boxes.shape[0]} boxes; pass 1 or {boxes.shape[0]}."
+                    )
+                if boxes.shape[0] == 1 and sat.shape[0] > 1:
+                    boxes = boxes.expand(sat.shape[0], 4)
+                sat = sat.expand(boxes.shape[0], -1, -1)
+                search = _fit_aspect_mask(
+                    boxes, sat, H, W, aspects, match_to, aspect_penalty, headroom_ratio, footroom_ratio,
+                    side_margin_ratio, bottom_priority, horiz_gravity,
+                )
+            rects = search["rect"].cpu()
+            choices = search["choice"].tolist()
+            per_image = zip(boxes.tolist(), rects.tolist(), choices, search["coverage"].tolist())
+            for (bx, by, bw, bh), (X, Y, Wc, Hc), k, cov in per_image:
+                ratio, tag = aspects[k]
+                lines.append(
+                    f"match_to={match_to}, chosen={tag}({ratio:.4f}), "
+                    f"img={W}x{H}, mq=({bx},{by},{bw},{bh}), "
+                    f"mask: coverage={cov:.4f} best of {search['candidates']}; "
+                    f"final=({X},{Y},{Wc},{Hc})"
+                )
+        else:
+            fit = _fit_aspect_batch(
+                boxes, H, W, aspects, match_to, headroom_ratio, footroom_ratio, side_margin_ratio,
+                bottom_priority, horiz_gravity,
+            )
+            rects = fit["rect"].cpu()
+            choices = fit["choice"].tolist()
+            per_image = zip(
+                boxes.tolist(), rects.tolist(), choices, fit["head_px"].tolist(), fit["foot_px"].tolist(),
+                fit["side_px"].tolist(), fit["loss_top"].tolist(), fit["loss_bot"].tolist(),
+            )
+            for (bx, by, bw, bh), (X, Y, Wc, Hc), k, head_px, foot_px, side_px, lt, lb in per_image:
+                ratio, tag = aspects[k]
+                lines.append(
+                    f"match_to={match_to}, chosen={tag}({ratio:.4f}), "
+                    f"img={W}x{H}, mq=({bx},{by},{bw},{bh}), "
+                    f"margins(px): head={head_px:.1f}, foot={foot_px:.1f}, side={side_px:.1f}, "
+                    f"viol: top={lt:.1f}, bot={lb:.1f}; final=({X},{Y},{Wc},{Hc})"
+                )
+
+        # Scalar outputs describe the first image; the full batch is in `rects`.
+        X, Y, Wc, Hc = rects[0].tolist()
+        tag = aspects[choices[0]][1]
+        dbg = lines[0] if len(lines) == 1 else "\n".join(f"[{i}] {line}" for i, line in enumerate(lines))
+        return (Wc, Hc, X, Y, tag, dbg, rects)
+
+
+def _crop_rects(t, rects):
+    """
+    Crop every item of t ([B, H, W, ...]) to its (x, y, w, h) rect. Crops of
+    different sizes are placed top-left in a zero-padded [B, max_h, max_w, ...]
+    batch.
+    """
+    B = t.shape[0]
+    max_w = max(r[2] for r in rects)
+    max_h = max(r[3] for r in rects)
+    if all(r[2] == max_w and r[3] == max_h for r in rects):
+        if B == 1:
+            x, y, w, h = rects[0]
+            return t[:, y:y + h, x:x + w]
+        return torch.stack([t[i, y:y + h, x:x + w] for i, (x, y, w, h) in enumerate(rects)])
+    out = t.new_zeros((B, max_h, max_w) + tuple(t.shape[3:]))
+    for i, (x, y, w, h) in enumerate(rects):
+        out[i, :h, :w] = t[i, y:y + h, x:x + w]
+    return out
+
+
+class SubjectCrop:
+    """
+    MQ BBox -> Fit Aspect (Head-Safe) -> crop in one node. The mask stays on
+    the image's device; only the per-image box integers reach the host.
+    """
 
-        head_px = headroom_ratio * ha
-        foot_px = footroom_ratio * ha
-        side_px = side_margin_ratio * wa
-        req_x0p = req_x0 - side_px
-        req_x1p = req_x1 + side_px
-        req_y0p = req_y0 - head_px
-        req_y1p = req_y1 + foot_px
-        xa, ya, wa, ha = _cover_min_rect(
-            req_x0p,
-            req_y0p,
-            max(1.0, req_x1p - req_x0p),
-            max(1.0, req_y1p - req_y0p),
-            ratio,
-        )
+    @classmethod
+    def INPUT_TYPES(cls):
+        bbox = MQBBoxMin.INPUT_TYPES()["required"]
+        fit = FitAspectHeadSafe.INPUT_TYPES()
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "mask": ("MASK",),
+                "invert_mask": bbox["invert_mask"],
+                "q_left": bbox["q_left"],
+                "q_right": bbox["q_right"],
+                "q_top": bbox["q_top"],
+                "q_bottom": bbox["q_bottom"],
+                "min_span_px": bbox["min_span_px"],
+                "aspects_csv": fit["required"]["aspects_csv"],
+                "match_to": fit["required"]["match_to"],
+                "headroom_ratio": fit["required"]["headroom_ratio"],
+                "footroom_ratio": fit["required"]["footroom_ratio"],
+                "side_margin_ratio": fit["required"]["side_margin_ratio"],
+                "bottom_priority": fit["required"]["bottom_priority"],
+                "horiz_gravity": fit["required"]["horiz_gravity"],
+            },
+            "optional": {
+                "pyramid": MQBBoxMin.INPUT_TYPES()["optional"]["pyramid"],
+                "mask_search": (
+                    "BOOLEAN",
+                    {
+                        "default": False,
+                        "tooltip": "Pick the crop by subject coverage (summed-area table search) instead of the fixed "
+                        "head-safe placements.",
+                    },
+                ),
+                "aspect_penalty": fit["optional"]["aspect_penalty"],
+            },
+        }
 
-        if horiz_gravity == "left":
-            xa = 0.0
-        elif horiz_gravity == "right":
-            xa = W - wa
-        else:
-            cx = x + w / 2.0
-            xa = cx - wa / 2.0
-        xa = max(0.0, min(xa, W - wa))
-
-        y_head = y
-        y_feet = y + h
-        y_top_des = y_head - head_px
-        y_bot_des = y_feet + foot_px
-        ya = y_top_des
-        ya = max(0.0, min(ya, H - ha))
-
-        def violations(Y):
-            top_gap = (Y) - (y_head - head_px)
-            bot_gap = (Y + ha) - (y_feet + foot_px)
-            loss_top = max(0.0, -top_gap)
-            loss_bot = max(0.0, -bot_gap)
-            return loss_top, loss_bot, (1.0 - bottom_priority) * loss_top + bottom_priority * loss_bot
-
-        candidates = [
-            max(0.0, min(y_top_des, H - ha)),
-            max(0.0, min(y_bot_des - ha, H - ha)),
-            0.0,
-            float(H - ha),
+    RETURN_TYPES = ("IMAGE", "MASK", "BBOXES", "BBOXES", "STRING")
+    RETURN_NAMES = ("image", "mask", "boxes", "rects", "debug")
+    FUNCTION = "run"
+    CATEGORY = "PortraitUtils/Transform"
+
+    def run(
+        self,
+        image,
+        mask,
+        invert_mask,
+        q_left,
+        q_right,
+        q_top,
+        q_bottom,
+        min_span_px,
+        aspects_csv,
+        match_to,
+        headroom_ratio,
+        footroom_ratio,
+        side_margin_ratio,
+        bottom_priority,
+        horiz_gravity,
+        pyramid=False,
+        mask_search=False,
+        aspect_penalty=0.25,
+    ):
+        with torch.no_grad():
+            img = enforce_image_format(image)
+            B, H, W, _ = img.shape
+            m = _to_mask_batch(mask).to(img.device)
+            if m.shape[0] not in (1, B) and B != 1:
+                raise ValueError(f"SubjectCrop: {m.shape[0]} masks for {B} images; pass 1 or {B}.")
+            m = _mask_at_size(m, H, W)
+            N = max(B, m.shape[0])
+
+            # One bbox pass per distinct mask; a single mask is shared by the batch.
+            final, flip, box_lines = _subject_boxes(
+                m, invert_mask, q_left, q_right, q_top, q_bottom, min_span_px, pyramid
+            )
+            if len(final) != N:
+                final, box_lines = final * N, box_lines * N
+                flip = flip.expand(N, 1)
+            boxes = torch.tensor(final, dtype=torch.int64).view(N, 4)
+
+            aspects = _parse_aspects(aspects_csv)
+            if mask_search:
+                fg = _normalize01(m)
+                fg = torch.where(flip.view(-1, 1, 1), 1.0 - fg, fg)
+                sat = _mask_sat(fg, H, W)
+                search = _fit_aspect_mask(
+                    boxes, sat.expand(N, -1, -1), H, W, aspects, match_to, aspect_penalty,
+                    headroom_ratio, footroom_ratio, side_margin_ratio, bottom_priority, horiz_gravity,
+                )
+                rects, choices = search["rect"], search["choice"]
+                notes = [f"coverage={c:.4f}" for c in search["coverage"].tolist()]
+            else:
+                fit = _fit_aspect_batch(
+                    boxes, H, W, aspects, match_to, headroom_ratio, footroom_ratio, side_margin_ratio,
+                    bottom_priority, horiz_gravity,
+                )
+                rects, choices = fit["rect"], fit["choice"]
+                notes = [
+                    f"viol: top={lt:.1f}, bot={lb:.1f}"
+                    for lt, lb in zip(fit["loss_top"].tolist(), fit["loss_bot"].tolist())
+                ]
+            rects = rects.cpu()
+            rect_list = [tuple(r) for r in rects.tolist()]
+
+            out_img = _crop_rects(img.expand(N, -1, -1, -1), rect_list)
+            out_mask = _crop_rects(m.expand(N, -1, -1), rect_list)
+
+        lines = [
+            f"{bl} | {aspects[k][1]} {note}; crop=({x},{y},{w},{h})"
+            for bl, k, note, (x, y, w, h) in zip(box_lines, choices.tolist(), notes, rect_list)
         ]
-        best = None
-        for Yc in candidates:
-            lt, lb, cost = violations(Yc)
-            if best is None or cost < best[0]:
-                best = (cost, Yc, lt, lb)
-        _, ya, lt, lb = best
-        ya = max(0.0, min(ya, H - ha))
-
-        X = int(round(xa))
-        Y = int(round(ya))
-        Wc = int(round(wa))
-        Hc = int(round(ha))
-        X = max(0, min(X, W - 1))
-        Y = max(0, min(Y, H - 1))
-        Wc = max(1, min(Wc, W - X))
-        Hc = max(1, min(Hc, H - Y))
-
-        dbg = (
-            f"match_to={match_to}, chosen={tag}({ratio:.4f}), "
-            f"img={W}x{H}, mq=({x},{y},{w},{h}), "
-            f"margins(px): head={head_px:.1f}, foot={foot_px:.1f}, side={side_px:.1f}, "
-            f"viol: top={lt:.1f}, bot={lb:.1f}; final=({X},{Y},{Wc},{Hc})"
+        if len({(r[2], r[3]) for r in rect_list}) > 1:
+            lines.append(f"padded to {out_img.shape[2]}x{out_img.shape[1]} (crops placed top-left)")
+        dbg = lines[0] if len(lines) == 1 else "\n".join(
+            line if line.startswith("padded") else f"[{i}] {line}" for i, line in enumerate(lines)
         )
-        return (Wc, Hc, X, Y, tag, dbg)
+        return (out_img, out_mask, boxes, rects, dbg)
 
 
 NODE_CLASS_MAPPINGS = {
     "MQBBoxMin": MQBBoxMin,
     "FitAspectHeadSafe": FitAspectHeadSafe,
+    "SubjectCrop": SubjectCrop,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "MQBBoxMin": "MQ BBox (MIN)",
     "FitAspectHeadSafe": "Fit Aspect (Head-Safe) - Closest AR + Tight Cover",
+    "SubjectCrop": "Subject Crop (BBox + Fit + Crop)",
 }
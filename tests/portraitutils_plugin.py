@@ -0,0 +1,31 @@
+"""
+Pytest plugin (loaded with ``-p`` from pyproject.toml) that makes the node
+modules importable without ComfyUI.
+
+The repository root is a ComfyUI node package whose ``__init__`` imports
+ComfyUI-only modules (``folder_paths``, ``node_helpers``) and OpenCV. It is
+registered as the package ``portraitutils`` without running that
+``__init__``, and collected as a plain directory, so tests import only the
+modules they exercise, e.g. ``from portraitutils import smart_crop``.
+It has to be a plugin rather than a conftest: the root directory is
+collected before any conftest below it is loaded.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+if "portraitutils" not in sys.modules:
+    package = types.ModuleType("portraitutils")
+    package.__path__ = [str(ROOT)]
+    sys.modules["portraitutils"] = package
+
+
+def pytest_collect_directory(path, parent):
+    if path == ROOT:
+        return pytest.Dir.from_parent(parent, path=path)
+    return None
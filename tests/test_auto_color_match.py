@@ -0,0 +1,42 @@
+import torch
+
+from portraitutils import auto_color_match as acm
+
+
+def _unsampled_pixel(ref):
+    # A pixel none of whose channels is among the fingerprint's strided samples.
+    n = ref.numel()
+    sampled = set(((torch.arange(acm._FINGERPRINT_SAMPLES, dtype=torch.int64) * 2654435761) % n).tolist())
+    channels = ref.shape[-1]
+    for pixel in range(n // channels):
+        if not any(pixel * channels + c in sampled for c in range(channels)):
+            return divmod(pixel, ref.shape[2])
+    raise AssertionError("every pixel is sampled")
+
+
+def test_reference_cache_misses_when_a_small_patch_changes():
+    acm._REF_STATS_CACHE.clear()
+    ref = torch.rand(1, 96, 128, 3, generator=torch.Generator().manual_seed(0))
+    prepare = lambda x: x
+
+    first = acm._reference_stats(ref, "test", prepare)
+    misses = acm._REF_CACHE_COUNTERS["misses"]
+    assert acm._reference_stats(ref.clone(), "test", prepare) is first
+    assert acm._REF_CACHE_COUNTERS["misses"] == misses
+
+    y, x = _unsampled_pixel(ref)
+    edited = ref.clone()
+    edited[0, y, x] = 1.0 - edited[0, y, x]
+    second = acm._reference_stats(edited, "test", prepare)
+    assert acm._REF_CACHE_COUNTERS["misses"] == misses + 1
+    assert second is not first
+
+
+def test_stats_error_report_covers_force_size():
+    image = torch.rand(2, 64, 48, 3, generator=torch.Generator().manual_seed(1))
+    _, debug, _ = acm.AutoWBColorMatch().run(
+        image, method="wb_grayworld", force_size=True, target_width=24, target_height=32,
+        stats_error_report=True,
+    )
+    assert "force_size=24x32" in debug
+    assert "vs exact:" in debug
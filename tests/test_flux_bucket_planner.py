@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image, PngImagePlugin
+
+from portraitutils import flux_resolution_prepare as frp
+
+
+def _noise(width, height):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def test_planner_reads_png_headers_without_decoding(tmp_path, monkeypatch):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    _noise(640, 480).save(folder / "plain.png")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90: displayed portrait
+    _noise(640, 480).save(folder / "rotated.png", exif=exif)
+
+    loads = []
+    original = PngImagePlugin.PngImageFile.load
+
+    def counting_load(self, *args, **kwargs):
+        loads.append(self.filename)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(PngImagePlugin.PngImageFile, "load", counting_load)
+
+    manifest = tmp_path / "manifest.json"
+    frp.FluxBucketPlanner().plan(str(folder), str(manifest))
+
+    assert loads == []
+    names = {os.path.basename(e["path"]) for e in json.loads(manifest.read_text())["images"]}
+    assert names == {"plain.png", "rotated.png"}
+
+
+def test_header_size_applies_exif_orientation(tmp_path):
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    for ext in ("jpg", "png", "webp", "tif"):
+        path = tmp_path / f"rotated.{ext}"
+        _noise(200, 100).save(path, exif=exif)
+        assert frp._header_size(str(path)) == (100, 200), ext
+    _noise(200, 100).save(tmp_path / "plain.png")
+    assert frp._header_size(str(tmp_path / "plain.png")) == (200, 100)
@@ -0,0 +1,32 @@
+import re
+
+import torch
+
+from portraitutils import smart_crop
+
+
+def _subject_mask(H, W, x0, y0, x1, y1):
+    mask = torch.zeros(1, H, W)
+    mask[:, y0:y1, x0:x1] = 1.0
+    return mask
+
+
+def test_mask_coverage_is_exact_above_one_megapixel():
+    # 1.3 MP, with subject edges that land mid-block for any block factor > 1.
+    H, W = 1301, 1003
+    mask = _subject_mask(H, W, 377, 211, 801, 1187)
+    image = torch.zeros(1, H, W, 3)
+
+    out = smart_crop.FitAspectHeadSafe().run(
+        image, 377, 211, 424, 976, "1:1", "mq_box", 0.12, 0.06, 0.08, 0.75, "center", mask=mask,
+    )
+    Wc, Hc, X, Y = out[:4]
+    reported = float(re.search(r"coverage=([0-9.]+)", out[5]).group(1))
+    expected = mask[0, Y:Y + Hc, X:X + Wc].sum().item() / mask.sum().item()
+    assert abs(reported - expected) < 1e-4
+
+    sat = smart_crop._mask_sat(mask, H, W)
+    rects = torch.tensor([[0, 0, W, H], [378, 212, 799, 1185], [5, 3, 380, 214], [401, 999, 1003, 1301]])
+    mass = smart_crop._box_mass(sat, *(rects[:, i].view(1, -1) for i in range(4)))
+    brute = [mask[0, y0:y1, x0:x1].sum().item() for x0, y0, x1, y1 in rects.tolist()]
+    assert mass.view(-1).tolist() == brute